@@ -0,0 +1,101 @@
+"""
+Throughput / latency of model inference across thread settings.
+
+Each configuration runs in a fresh process (torch only lets the inter-op pool
+be sized once per process). A configuration is INFERENCE_WORKERS x TORCH_NUM_THREADS.
+
+Run from backend/:
+    python -m ML_Model.evaluate.benchmark_threads
+    python -m ML_Model.evaluate.benchmark_threads --configs 1x4,2x2,4x1 --interop 1 --pin --requests 128 --concurrency 16
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "heldout_reactions.csv")
+
+def run_one(requests, concurrency):
+    # child process: env already holds the thread settings
+    from ML_Model.models import runtime
+    from ML_Model.models.chemberta_features import get_chemberta_features_batch
+    from ML_Model.models.productPredictor import predict_products
+
+    runtime.configure_torch()
+    runtime.warmup()
+    df = pd.read_csv(FIXTURE)
+    pairs = list(zip(df["reactant1"], df["reactant2"]))
+    latencies = []
+    lock = threading.Lock()
+
+    def one_request(i):
+        r1, r2 = pairs[i % len(pairs)]
+        started = time.perf_counter()
+        product = runtime.run_inference(predict_products, [(r1, r2)])[0][0]
+        runtime.run_inference(get_chemberta_features_batch, [f"{r1}.{r2}>>{product}"])
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        list(clients.map(one_request, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda p: 1000 * latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+    print(json.dumps({
+        "throughput_rps": requests / wall,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inference across thread settings")
+    parser.add_argument("--configs", default="1x1,1x2,1x4,2x2,4x1", help="comma separated INFERENCE_WORKERSxTORCH_NUM_THREADS")
+    parser.add_argument("--interop", type=int, default=1, help="TORCH_INTEROP_THREADS")
+    parser.add_argument("--pin", action="store_true", help="pin inference threads to cores")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8, help="simultaneous client requests")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args.requests, args.concurrency)
+        return
+
+    print(f"{os.cpu_count()} cpus, {args.requests} requests, {args.concurrency} concurrent clients")
+    print(f"{'config':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for config in [c.strip() for c in args.configs.split(",") if c.strip()]:
+        workers, threads = config.split("x")
+        env = dict(
+            os.environ,
+            INFERENCE_WORKERS=workers,
+            TORCH_NUM_THREADS=threads,
+            TORCH_INTEROP_THREADS=str(args.interop),
+            OMP_NUM_THREADS=threads,
+            PIN_INFERENCE_THREADS="1" if args.pin else "0",
+            HF_HUB_OFFLINE="1",
+            TRANSFORMERS_OFFLINE="1",
+            TOKENIZERS_PARALLELISM="false",
+        )
+        out = subprocess.run(
+            [sys.executable, "-m", "ML_Model.evaluate.benchmark_threads", "--run-one",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, capture_output=True, text=True,
+        )
+        lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+        if out.returncode != 0 or not lines:
+            print(f"{config:>10}  failed: {out.stderr.strip().splitlines()[-1:] or out.returncode}")
+            continue
+        r = json.loads(lines[-1])
+        print(f"{config:>10}{r['throughput_rps']:>10.2f}{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}{r['p99_ms']:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Offline evaluation of the full prediction pipeline.
+
+Runs predict_reactions_batch over a held-out set and reports product
+exact-match (top-1 / top-k, after canonicalization), reaction type and hazard
+F1, and per-stage latency / throughput for each backend side by side.
+
+Top-1, F1 and all timings come from the served configuration (greedy decoding,
+one candidate). Top-k comes from an extra, untimed beam search run.
+
+Run from backend/:
+    python -m ML_Model.evaluate.evaluate_model
+    python -m ML_Model.evaluate.evaluate_model --data data/heldout.csv --backends fp32,quantized,cached --top-k 3
+
+The held-out CSV has reactant1, reactant2, product and optionally reaction_type,
+safety_hazard_level columns, or is a slice of the training file
+(original_reactions, mechanistic_class, mechanistic_label).
+
+safety_hazard_level has to be in the classifier's label space
+(label_mechanistic_hazard: Low / Moderate / High / Unknown by mechanistic step
+count), not a chemical danger rating. The bundled fixture has no mechanistic
+labels, so it leaves hazard out and no hazard_f1 is reported for it. The same
+goes for reaction_type (the classifier's mechanistic_class labels): an F1 is
+only reported when the data's labels overlap the trained encoder's classes.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+# everything comes from the local HF cache and local files
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import pandas as pd
+from sklearn.metrics import f1_score
+
+from ML_Model.utils.label_utils import label_mechanistic_hazard
+from ML_Model.utils.reaction_lookup import reaction_key
+
+DEFAULT_DATA = Path(__file__).parent / "fixtures" / "heldout_reactions.csv"
+STAGES = ["lookup", "name_resolution", "product", "classification"]
+
+def load_heldout(path):
+    df = pd.read_csv(path)
+    if "original_reactions" in df.columns:
+        rows = []
+        for row in df.dropna(subset=["original_reactions"]).to_dict("records"):
+            try:
+                reactant_part, product_part = row["original_reactions"].split(">>")
+            except ValueError:
+                continue
+            first, _, rest = reactant_part.partition(".")
+            rows.append({
+                "reactant1": first,
+                "reactant2": rest,
+                "product": product_part,
+                "reaction_type": row.get("mechanistic_class"),
+                "safety_hazard_level": label_mechanistic_hazard(row["mechanistic_label"]) if "mechanistic_label" in row else None,
+            })
+        df = pd.DataFrame(rows)
+    return df.dropna(subset=["reactant1", "reactant2", "product"]).reset_index(drop=True)
+
+def canonical(smiles):
+    return reaction_key([smiles]) if isinstance(smiles, str) and smiles.strip() else ""
+
+@contextmanager
+def use_backend(name):
+    # swaps the module-level models for dynamically quantized (int8 Linear) copies
+    if name != "quantized":
+        yield
+        return
+    import torch
+    from ML_Model.models import chemberta_features, productPredictor
+    originals = chemberta_features.model, productPredictor.model
+    chemberta_features.model = torch.quantization.quantize_dynamic(originals[0], {torch.nn.Linear}, dtype=torch.qint8)
+    productPredictor.model = torch.quantization.quantize_dynamic(originals[1], {torch.nn.Linear}, dtype=torch.qint8)
+    try:
+        yield
+    finally:
+        chemberta_features.model, productPredictor.model = originals
+
+def run_pipeline(pairs, input_type, num_candidates, batch_size, workers, use_lookup):
+    from ML_Model.predict.predict_reaction import predict_reactions_batch
+
+    batches = [pairs[i:i + batch_size] for i in range(0, len(pairs), batch_size)]
+    timings = [dict() for _ in batches]
+
+    def run(i):
+        return predict_reactions_batch(batches[i], input_type=input_type, num_candidates=num_candidates,
+                                       timings=timings[i], use_lookup=use_lookup)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outputs = list(pool.map(run, range(len(batches))))
+    wall = time.perf_counter() - started
+
+    stage_totals = {s: sum(t.get(s, 0.0) for t in timings) for s in STAGES}
+    return [r for batch in outputs for r in batch], stage_totals, wall
+
+def classifier_labels():
+    # what the served classifiers can output; F1 against labels outside these is 0 by construction
+    from ML_Model.predict import predict_reaction as pipeline
+    return {
+        "reaction_type": {str(c) for c in pipeline.le_type.classes_},
+        "safety_hazard_level": {str(c) for c in pipeline.le_hazard.classes_},
+    }
+
+def score(df, results, known_labels):
+    expected = [canonical(p) for p in df["product"]]
+    top1 = [canonical(r["product"]) == e for r, e in zip(results, expected)]
+    metrics = {"top1_exact_match": sum(top1) / len(df)}
+    for column, key in (("reaction_type", "type_f1"), ("safety_hazard_level", "hazard_f1")):
+        if column not in df.columns:
+            continue
+        labelled = [(str(t), str(r[column])) for t, r in zip(df[column], results) if pd.notna(t)]
+        if not labelled:
+            continue
+        if not {t for t, _ in labelled} & known_labels[column]:
+            print(f"skipping {key}: none of the data's {column} labels are in the classifier's label space")
+            continue
+        y_true, y_pred = zip(*labelled)
+        metrics[key] = f1_score(y_true, y_pred, average="macro", zero_division=0)
+    return metrics
+
+def score_topk(df, results, top_k):
+    expected = [canonical(p) for p in df["product"]]
+    hits = [e in {canonical(c) for c in r["product_candidates"][:top_k]} for r, e in zip(results, expected)]
+    return sum(hits) / len(df)
+
+def evaluate_backend(backend, df, args):
+    from ML_Model.predict import predict_reaction as pipeline
+
+    pairs = list(zip(df["reactant1"], df["reactant2"]))
+    with use_backend(backend):
+        pipeline.product_cache.clear()
+        pipeline.classification_cache.clear()
+        # the served configuration (greedy, one candidate) gives top-1, F1 and all timings
+        if backend == "cached":
+            # untimed pass to fill the product / classification caches
+            run_pipeline(pairs, args.input_type, 1, args.batch_size, args.workers, args.with_lookup)
+        results, stages, wall = run_pipeline(pairs, args.input_type, 1, args.batch_size, args.workers, args.with_lookup)
+        # top-k needs beam search, which isn't served; it's a separate, untimed run
+        topk = None
+        if args.top_k > 1:
+            beam_results, _, _ = run_pipeline(pairs, args.input_type, args.top_k, args.batch_size, args.workers, args.with_lookup)
+            topk = score_topk(df, beam_results, args.top_k)
+
+    report = {"backend": backend, "reactions": len(df)}
+    report.update(score(df, results, classifier_labels()))
+    if topk is not None:
+        report[f"top{args.top_k}_exact_match_beam"] = topk
+    report.update({f"{s}_ms_per_reaction": 1000 * t / len(df) for s, t in stages.items()})
+    report["wall_s"] = wall
+    report["throughput_rps"] = len(df) / wall if wall else float("inf")
+    return report
+
+def print_table(reports):
+    keys = [k for k in reports[0] if k != "backend"]
+    width = max(len(k) for k in keys) + 2
+    print("".ljust(width) + "".join(r["backend"].rjust(12) for r in reports))
+    for k in keys:
+        cells = []
+        for r in reports:
+            v = r.get(k, "")
+            cells.append((f"{v:.3f}" if isinstance(v, float) else str(v)).rjust(12))
+        print(k.ljust(width) + "".join(cells))
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the reaction prediction pipeline offline")
+    parser.add_argument("--data", default=str(DEFAULT_DATA), help="held-out reactions csv")
+    parser.add_argument("--backends", default="fp32,quantized,cached", help="comma separated: fp32, quantized, cached")
+    parser.add_argument("--input-type", default="smiles", choices=["smiles", "name"])
+    parser.add_argument("--top-k", type=int, default=3, help="beam width of the extra top-k run (1 = skip it)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2, help="batches evaluated in parallel")
+    parser.add_argument("--limit", type=int, default=None, help="only use the first N reactions")
+    parser.add_argument("--with-lookup", action="store_true", help="let the reaction lookup answer known reactions")
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    df = load_heldout(args.data)
+    if args.limit:
+        df = df.head(args.limit)
+    print(f"Evaluating {len(df)} reactions from {args.data}")
+
+    reports = []
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        print(f"Running backend: {backend} ...")
+        reports.append(evaluate_backend(backend, df, args))
+
+    print_table(reports)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,29 @@
 from transformers import AutoTokenizer, AutoModel
+import numpy as np
 import torch
 
+from ML_Model.models.tokenization import encode, max_tokens_for, pad, run_bucketed
+
 tokenizer = AutoTokenizer.from_pretrained("seyonec/ChemBERTa-zinc-base-v1")
 model = AutoModel.from_pretrained("seyonec/ChemBERTa-zinc-base-v1")
+max_tokens = max_tokens_for(tokenizer, model)
+
+def _mean_pool(inputs, _longest=None):
+    # mean over real tokens only so padding doesn't dilute the embedding
+    hidden = model(**inputs).last_hidden_state
+    mask = inputs["attention_mask"].unsqueeze(-1).type_as(hidden)
+    return ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).numpy()
 
 def get_chemberta_features(smiles):
-    # Truncate to 512
-    max_len = 512
-    if len(smiles) > max_len:
-        smiles = smiles[:max_len]
-    inputs = tokenizer(smiles, return_tensors="pt")
-    with torch.no_grad():
-        outputs = model(**inputs)
-        features = outputs.last_hidden_state.mean(dim=1).squeeze()
-    return features.numpy()
\ No newline at end of file
+    # truncated by tokens, not characters
+    ids, _ = encode(tokenizer, [smiles], max_tokens)
+    with torch.inference_mode():
+        features = _mean_pool(pad(tokenizer, ids))
+    return features[0]
+
+def get_chemberta_features_batch(smiles_list, batch_size=16):
+    # batches of similar length, so short reactions aren't padded out to the longest one
+    ids, _ = encode(tokenizer, list(smiles_list), max_tokens)
+    with torch.inference_mode():
+        features = run_bucketed(_mean_pool, tokenizer, ids, batch_size=batch_size)
+    return np.stack(features)
@@ -1,14 +1,33 @@
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import torch
+
+from ML_Model.models.tokenization import encode, max_tokens_for, run_bucketed
 
 # Load the ReactionT5 model (forward reaction prediction)
 model_name = "sagawa/ReactionT5v2-forward-USPTO_MIT"
 tokenizer = AutoTokenizer.from_pretrained(model_name)
 model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+max_tokens = max_tokens_for(tokenizer, model)
 
 def predict_product(reactant1_smiles, reactant2_smiles):
     # Format input as required: "reactant1.SMILES.reactant2.SMILES>>"
-    input_str = f"{reactant1_smiles}.{reactant2_smiles}>>"
-    inputs = tokenizer([input_str], return_tensors="pt")
-    outputs = model.generate(**inputs, max_length=128)
-    product_smiles = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    return product_smiles
\ No newline at end of file
+    return predict_products([(reactant1_smiles, reactant2_smiles)])[0][0]
+
+def predict_products(reactant_pairs, num_candidates=1, max_length=128, batch_size=16):
+    # batched beam search; returns the top num_candidates product smiles per pair, best first
+    num_candidates = max(num_candidates, 1)
+    ids, _ = encode(tokenizer, [f"{r1}.{r2}>>" for r1, r2 in reactant_pairs], max_tokens)
+
+    def generate(inputs, longest):
+        # a long input can have a long product; don't cut it off at max_length
+        outputs = model.generate(
+            **inputs,
+            max_length=min(max(max_length, longest), max_tokens),
+            num_beams=num_candidates,
+            num_return_sequences=num_candidates,
+        )
+        decoded = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        return [decoded[i * num_candidates:(i + 1) * num_candidates] for i in range(len(decoded) // num_candidates)]
+
+    with torch.inference_mode():
+        return run_bucketed(generate, tokenizer, ids, batch_size=batch_size)
@@ -0,0 +1,116 @@
+"""
+Inference runtime settings shared by ChemBERTa and ReactionT5.
+
+All model calls from the API go through a small dedicated thread pool, so the
+number of concurrent forward passes (and torch threads) stays fixed no matter
+how many requests are in flight.
+
+Env vars:
+    INFERENCE_WORKERS       threads running model calls concurrently (default 1)
+    TORCH_NUM_THREADS       intra-op threads per model call (default: cores / INFERENCE_WORKERS)
+    TORCH_INTEROP_THREADS   inter-op threads (default 1)
+    PIN_INFERENCE_THREADS   1 = pin each inference thread to its own slice of cores
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+def _available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not linux
+        return list(range(os.cpu_count() or 1))
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 1))
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", max(1, len(_available_cpus()) // INFERENCE_WORKERS)))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", 1))
+PIN_INFERENCE_THREADS = os.getenv("PIN_INFERENCE_THREADS", "0") == "1"
+
+_local = threading.local()
+_pool = None
+_pool_lock = threading.Lock()
+_worker_count = 0
+
+def configure_torch(intra_op=None, inter_op=None):
+    torch.set_num_threads(intra_op or TORCH_NUM_THREADS)
+    try:
+        # only allowed before the first inter-op parallel work in the process
+        torch.set_num_interop_threads(inter_op or TORCH_INTEROP_THREADS)
+    except RuntimeError:
+        pass
+
+def pin_process(index, count):
+    # give this process its own slice of the cores (used by forked server workers)
+    cpus = _available_cpus()
+    size = max(1, len(cpus) // max(count, 1))
+    chunk = cpus[(index % count) * size:(index % count + 1) * size] or cpus
+    try:
+        os.sched_setaffinity(0, chunk)
+    except (AttributeError, OSError):
+        pass
+
+def _init_worker(pin):
+    global _worker_count
+    _local.is_inference_thread = True
+    with _pool_lock:
+        index = _worker_count
+        _worker_count += 1
+    if pin:
+        cpus = _available_cpus()
+        size = max(1, len(cpus) // INFERENCE_WORKERS)
+        chunk = cpus[(index % INFERENCE_WORKERS) * size:(index % INFERENCE_WORKERS + 1) * size] or cpus
+        try:
+            # on linux pid 0 means the calling thread; torch's threads spawned from it inherit the mask
+            os.sched_setaffinity(0, chunk)
+        except (AttributeError, OSError):
+            pass
+    torch.set_num_threads(TORCH_NUM_THREADS)
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=INFERENCE_WORKERS,
+                    thread_name_prefix="inference",
+                    initializer=_init_worker,
+                    initargs=(PIN_INFERENCE_THREADS,),
+                )
+    return _pool
+
+def run_inference(fn, *args, **kwargs):
+    '''
+    Run a model call on the inference pool under torch.inference_mode and wait for it.
+    '''
+    if getattr(_local, "is_inference_thread", False):
+        with torch.inference_mode():
+            return fn(*args, **kwargs)
+
+    def call():
+        with torch.inference_mode():
+            return fn(*args, **kwargs)
+    return _get_pool().submit(call).result()
+
+def warmup(lengths=(16, 64, 128, 256), batch_size=4):
+    '''
+    Push dummy batches of representative token lengths through both models so
+    the first real requests don't pay for allocator growth and kernel selection.
+    '''
+    from ML_Model.models import chemberta_features, productPredictor
+
+    for n in lengths:
+        smiles = _text_of_length(chemberta_features.tokenizer, n)
+        run_inference(chemberta_features.get_chemberta_features_batch, [smiles] * batch_size)
+        reactant = _text_of_length(productPredictor.tokenizer, n, fmt=lambda t: f"{t}.O>>")
+        run_inference(productPredictor.predict_products, [(reactant, "O")] * batch_size, max_length=min(n, 128))
+
+def _text_of_length(tokenizer, n, fmt=lambda text: text, unit="CC(=O)O."):
+    # bpe merges runs like "CCCC" into few tokens, so measure instead of counting
+    # characters: grow a mixed fragment until fmt(text) is n tokens (within one unit)
+    text = unit
+    while len(tokenizer(fmt(text))["input_ids"]) < n:
+        text += unit
+    return text
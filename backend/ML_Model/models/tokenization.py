@@ -0,0 +1,79 @@
+"""
+Tokenization shared by ChemBERTa and ReactionT5.
+
+- truncates by token count (keeping the special tokens), not by characters
+- caches token ids per input string, so repeated reactions/reactants skip the tokenizer
+- groups inputs of similar token length into batches, so little compute goes
+  to padding, and puts the results back in input order
+"""
+from ML_Model.utils.cache_utils import LRUCache
+
+_token_cache = LRUCache(maxsize=20000)
+
+def max_tokens_for(tokenizer, model=None):
+    # tokenizers without a configured limit report a huge model_max_length
+    limit = min(tokenizer.model_max_length, 4096)
+    if model is not None:
+        positions = getattr(model.config, "max_position_embeddings", None) or getattr(model.config, "n_positions", None)
+        if positions:
+            # roberta-style models reserve two positions for the padding offset
+            limit = min(limit, positions - 2 if model.config.model_type == "roberta" else positions)
+    return limit
+
+def encode(tokenizer, texts, max_tokens):
+    '''
+    Token ids for each text, truncated to max_tokens. Returns (ids_list, truncated_count).
+    '''
+    ids_list, truncated = [], 0
+    name = tokenizer.name_or_path
+    for text in texts:
+        key = (name, text, max_tokens)
+        cached = _token_cache.get(key)
+        if cached is None:
+            full = tokenizer(text)["input_ids"]
+            if len(full) > max_tokens:
+                # keeps the special tokens at both ends, unlike cutting the string
+                ids = tokenizer(text, truncation=True, max_length=max_tokens)["input_ids"]
+                print(f"input truncated from {len(full)} to {max_tokens} tokens: {text[:60]}...")
+                cached = (ids, True)
+            else:
+                cached = (full, False)
+            _token_cache.set(key, cached)
+        ids_list.append(cached[0])
+        truncated += cached[1]
+    return ids_list, truncated
+
+def length_buckets(lengths, batch_size, max_batch_tokens=None):
+    '''
+    Index batches ordered by length. A batch ends at batch_size items, or earlier
+    when padding every item to the longest one would exceed max_batch_tokens.
+    '''
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, current = [], []
+    for i in order:
+        # sorted, so item i is the longest in the batch it joins
+        if current and (len(current) >= batch_size or
+                        (max_batch_tokens and lengths[i] * (len(current) + 1) > max_batch_tokens)):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+def pad(tokenizer, ids_list):
+    return tokenizer.pad({"input_ids": ids_list}, padding=True, return_tensors="pt")
+
+def run_bucketed(fn, tokenizer, ids_list, batch_size=16, max_batch_tokens=8192):
+    '''
+    Calls fn(padded_inputs, longest_length) per length bucket; fn returns one
+    output per row. Outputs are returned in the order of ids_list.
+    '''
+    lengths = [len(ids) for ids in ids_list]
+    results = [None] * len(ids_list)
+    for batch in length_buckets(lengths, batch_size, max_batch_tokens):
+        inputs = pad(tokenizer, [ids_list[i] for i in batch])
+        outputs = fn(inputs, max(lengths[i] for i in batch))
+        for i, out in zip(batch, outputs):
+            results[i] = out
+    return results
@@ -0,0 +1,10 @@
+import numpy as np
+
+def predict_yield(model, features):
+    '''
+    Yield (%) and uncertainty from a fitted RandomForestRegressor.
+    The uncertainty is the spread of the per-tree predictions.
+    features: array of shape (n_samples, n_features)
+    '''
+    per_tree = np.stack([tree.predict(features) for tree in model.estimators_])
+    return np.clip(per_tree.mean(axis=0), 0, 100), per_tree.std(axis=0)
@@ -1,7 +1,15 @@
 import joblib
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from ML_Model.utils.smiles_utils import is_valid_reaction_smiles, name_to_smiles, is_valid_smiles
-from ML_Model.models.chemberta_features import get_chemberta_features
-from ML_Model.models.productPredictor import predict_product
+from ML_Model.models.chemberta_features import get_chemberta_features_batch
+from ML_Model.models.productPredictor import predict_products
+from ML_Model.models.yield_model import predict_yield
+from ML_Model.models.runtime import run_inference
+from ML_Model.utils.reaction_lookup import load_lookup
+from ML_Model.utils.deadline_utils import run_with_deadline
+from ML_Model.utils.cache_utils import LRUCache
 from pathlib import Path
 
 # Step 1: Get user's Downloads folder
@@ -15,20 +23,148 @@ clf_type = joblib.load(f"{models_dir}/reaction_type_model.pkl")
 le_type = joblib.load(f"{models_dir}/reaction_type_encoder.pkl")
 clf_hazard = joblib.load(f"{models_dir}/hazard_level_model.pkl")
 le_hazard = joblib.load(f"{models_dir}/hazard_level_encoder.pkl")
+reaction_lookup = load_lookup()  # same REACTION_LOOKUP_PATH resolution as the api
+# optional until a dataset with yields has been trained on
+yield_model_path = models_dir / "yield_model.pkl"
+reg_yield = joblib.load(yield_model_path) if yield_model_path.exists() else None
 
-def predict_reaction(reactant1, reactant2, input_type="name"):
-    if input_type == "name":
-        r1 = name_to_smiles(reactant1) or reactant1
-        r2 = name_to_smiles(reactant2) or reactant2
-        p = predict_product(r1, r2)
-    else:
-        r1, r2, p = reactant1, reactant2, predict_product(reactant1, reactant2)
-
-    reaction_smiles = f"{r1}.{r2}>>{p}"
-    if is_valid_reaction_smiles(reaction_smiles):
-        features = get_chemberta_features(reaction_smiles).reshape(1, -1)
-        pred_type = le_type.inverse_transform(clf_type.predict(features))[0]
-        pred_hazard = le_hazard.inverse_transform(clf_hazard.predict(features))[0]
-        return pred_type, pred_hazard, p
-    else:
-        return "Invalid reaction SMILES", "Invalid reaction SMILES", "Invalid reaction SMILES"
\ No newline at end of file
+# deterministic per input, so repeated reactions skip the models entirely
+product_cache = LRUCache(maxsize=4096)
+classification_cache = LRUCache(maxsize=4096)
+_resolve_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="resolve")
+
+INVALID = "Invalid reaction SMILES"
+
+@contextmanager
+def _stage(timings, name):
+    # accumulates wall time per pipeline stage when the caller passes a dict
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+def _check(deadline, stage):
+    # local inference can't be interrupted, so check the budget between stages
+    if deadline is not None:
+        deadline.check(stage)
+
+def classify_reactions(reaction_smiles_list):
+    # one feature pass feeds the type, hazard and yield models together, for the whole batch
+    misses = list(dict.fromkeys(rs for rs in reaction_smiles_list if classification_cache.get(rs) is None))
+    if misses:
+        features = run_inference(get_chemberta_features_batch, misses)
+        types = le_type.inverse_transform(clf_type.predict(features))
+        hazards = le_hazard.inverse_transform(clf_hazard.predict(features))
+        if reg_yield is not None:
+            yields, spreads = predict_yield(reg_yield, features)
+        else:
+            yields = spreads = [None] * len(misses)
+        for rs, t, h, y, u in zip(misses, types, hazards, yields, spreads):
+            classification_cache.set(rs, (
+                t, h,
+                None if y is None else round(float(y), 1),
+                None if u is None else round(float(u), 1),
+            ))
+    return [classification_cache.get(rs) for rs in reaction_smiles_list]
+
+def classify_reaction(reaction_smiles):
+    return classify_reactions([reaction_smiles])[0]
+
+def predict_products_cached(reactant_pairs, num_candidates=1):
+    keys = [(r1, r2, num_candidates) for r1, r2 in reactant_pairs]
+    misses = list(dict.fromkeys(k for k in keys if product_cache.get(k) is None))
+    if misses:
+        predicted = run_inference(predict_products, [k[:2] for k in misses], num_candidates=num_candidates)
+        for key, candidates in zip(misses, predicted):
+            product_cache.set(key, candidates)
+    return [product_cache.get(k) for k in keys]
+
+def _resolve_names(names, deadline):
+    unique = list(dict.fromkeys(names))
+    futures = {n: _resolve_pool.submit(run_with_deadline, name_to_smiles, n, deadline=deadline, stage="name resolution") for n in unique}
+    return {n: f.result() or n for n, f in futures.items()}
+
+def _from_lookup(known):
+    return {
+        "reaction_type": known["reaction_type"],
+        "safety_hazard_level": known["safety_hazard_level"],
+        "product": known["product_smiles"] or known["product"],
+        "product_candidates": [known["product_smiles"] or known["product"]],
+        "predicted_yield": known.get("predicted_yield"),
+        "yield_uncertainty": None,
+        "source": "lookup",
+    }
+
+def _invalid(candidates):
+    return {
+        "reaction_type": INVALID,
+        "safety_hazard_level": INVALID,
+        "product": INVALID,
+        "product_candidates": candidates,
+        "predicted_yield": None,
+        "yield_uncertainty": None,
+        "source": "model",
+    }
+
+def predict_reactions_batch(reactant_pairs, input_type="name", num_candidates=1, deadline=None, timings=None, use_lookup=True):
+    '''
+    Batched version of predict_reaction. Each stage (name resolution, product
+    prediction, classification) runs once for the whole batch. Returns one dict
+    per pair, in input order.
+    '''
+    results = [None] * len(reactant_pairs)
+
+    # known reactions are answered from the precomputed index without touching the models
+    with _stage(timings, "lookup"):
+        if use_lookup and reaction_lookup is not None:
+            for i, (r1, r2) in enumerate(reactant_pairs):
+                known = reaction_lookup.lookup(r1, r2)
+                if known:
+                    results[i] = _from_lookup(known)
+    todo = [i for i, r in enumerate(results) if r is None]
+    if not todo:
+        return results
+
+    with _stage(timings, "name_resolution"):
+        if input_type == "name":
+            resolved = _resolve_names([n for i in todo for n in reactant_pairs[i]], deadline)
+            pairs = {i: (resolved[reactant_pairs[i][0]], resolved[reactant_pairs[i][1]]) for i in todo}
+        else:
+            pairs = {i: tuple(reactant_pairs[i]) for i in todo}
+
+    _check(deadline, "product prediction")
+    with _stage(timings, "product"):
+        candidates = dict(zip(todo, predict_products_cached([pairs[i] for i in todo], num_candidates)))
+
+    reactions = {}
+    for i in todo:
+        r1, r2 = pairs[i]
+        reaction_smiles = f"{r1}.{r2}>>{candidates[i][0]}"
+        if is_valid_reaction_smiles(reaction_smiles):
+            reactions[i] = reaction_smiles
+        else:
+            results[i] = _invalid(candidates[i])
+
+    _check(deadline, "classification")
+    with _stage(timings, "classification"):
+        classified = classify_reactions(list(reactions.values()))
+    for i, (pred_type, pred_hazard, pred_yield, yield_uncertainty) in zip(reactions, classified):
+        results[i] = {
+            "reaction_type": pred_type,
+            "safety_hazard_level": pred_hazard,
+            "product": candidates[i][0],
+            "product_candidates": candidates[i],
+            "predicted_yield": pred_yield,
+            "yield_uncertainty": yield_uncertainty,
+            "source": "model",
+        }
+    return results
+
+def predict_reaction_details(reactant1, reactant2, input_type="name", deadline=None):
+    return predict_reactions_batch([(reactant1, reactant2)], input_type=input_type, deadline=deadline)[0]
+
+def predict_reaction(reactant1, reactant2, input_type="name", deadline=None):
+    result = predict_reaction_details(reactant1, reactant2, input_type=input_type, deadline=deadline)
+    return result["reaction_type"], result["safety_hazard_level"], result["product"]
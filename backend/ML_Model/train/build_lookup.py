@@ -0,0 +1,80 @@
+import os
+import sys
+import pandas as pd
+
+from ML_Model.utils.label_utils import label_mechanistic_hazard, parse_yield
+from ML_Model.utils.reaction_lookup import reaction_key, normalize_reactant, write_lookup
+from ML_Model.utils.smiles_utils import name_to_smiles
+
+# run from backend/: python -m ML_Model.train.build_lookup [output_path]
+models_dir = "ML_Model/models"
+train_path = "data/traindata.csv"
+curated_paths = ["data/chemical_reactions_raw.csv", "data/chemical_reactions.csv"]
+output_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(models_dir, "reaction_lookup.bin")
+
+def reactant_smiles(reactants):
+    # normalized reactant -> canonical smiles, so lookup hits can report smiles for name inputs
+    # (names are resolved once here, through the shared name cache)
+    smiles = {}
+    for r in reactants:
+        for p in (p for p in str(r).split(".") if p.strip()):
+            normalized = normalize_reactant(p)
+            if normalized != p.strip().lower():
+                smiles[normalized] = normalized
+                continue
+            try:
+                resolved = name_to_smiles(p.strip())
+            except Exception:
+                resolved = None
+            if resolved:
+                smiles[normalized] = normalize_reactant(resolved)
+    return smiles
+
+def curated_records(path):
+    # curated files: Reactant1_SMILES, Reactant2_SMILES, Product_SMILES, Reaction_Type, Safety_Hazard_Level
+    # (the raw file holds common names in the *_SMILES columns)
+    # an optional Yield column is carried over as the stored yield
+    df = pd.read_csv(path).dropna(subset=['Reactant1_SMILES', 'Reactant2_SMILES', 'Product_SMILES'])
+    for row in df.to_dict("records"):
+        product = str(row['Product_SMILES']).strip()
+        canonical = normalize_reactant(product)
+        yield reaction_key([row['Reactant1_SMILES'], row['Reactant2_SMILES']]), {
+            "reactant_smiles": reactant_smiles([row['Reactant1_SMILES'], row['Reactant2_SMILES']]),
+            "product": product,
+            "product_smiles": canonical if canonical != product.lower() else "",
+            "reaction_type": row['Reaction_Type'],
+            "safety_hazard_level": row['Safety_Hazard_Level'],
+            "predicted_yield": parse_yield(row.get('Yield')),
+            "source": os.path.basename(path),
+        }
+
+def training_records(path):
+    df = pd.read_csv(path).dropna(subset=['original_reactions', 'mechanistic_class', 'mechanistic_label'])
+    for row in df.to_dict("records"):
+        try:
+            reactant_part, product_part = row['original_reactions'].split(">>")
+        except ValueError:
+            continue
+        product = ".".join(normalize_reactant(p) for p in product_part.split(".") if p.strip())
+        yield reaction_key([reactant_part]), {
+            "reactant_smiles": reactant_smiles([reactant_part]),
+            "product": product,
+            "product_smiles": product,
+            "reaction_type": row['mechanistic_class'],
+            "safety_hazard_level": label_mechanistic_hazard(row['mechanistic_label']),
+            "predicted_yield": parse_yield(row.get('yield')),
+            "source": os.path.basename(path),
+        }
+
+def all_records():
+    # curated reactions come first so they win over training rows with the same key
+    for path in curated_paths:
+        if os.path.exists(path):
+            print(f"Indexing {path} ...")
+            yield from curated_records(path)
+    if os.path.exists(train_path):
+        print(f"Indexing {train_path} ...")
+        yield from training_records(train_path)
+
+n = write_lookup(all_records(), output_path)
+print(f"Wrote {n} reactions to {output_path}")
@@ -1,36 +1,21 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import classification_report
+from sklearn.metrics import classification_report, mean_absolute_error, r2_score
 import joblib
 import os
 
 from ML_Model.utils.smiles_utils import is_valid_reaction_smiles
+from ML_Model.utils.label_utils import label_mechanistic_hazard, parse_yield
 from ML_Model.models.chemberta_features import get_chemberta_features
 
 models_dir = "ML_Model/models"
 os.makedirs(models_dir, exist_ok=True)
 data_path = "data/traindata.csv"  # Update as needed
-
-def label_mechanistic_hazard(label_str):
-    """
-    Placeholder hazard level based on number of unique mechanistic steps.
-    You MUST update this mapping based on domain knowledge.
-    """
-    try:
-        items = eval(label_str)
-        vals = []
-        for elem in items:
-            if isinstance(elem, (list, tuple)): vals.extend(elem)
-            else: vals.append(elem)
-        n = len(set([int(float(i)) for i in vals if str(i).replace('.', '', 1).isdigit()]))
-        if n > 10: return 'High'
-        elif n > 5: return 'Moderate'
-        else: return 'Low'
-    except Exception:
-        return 'Unknown'
+yield_column = "yield"  # optional; the yield stage is skipped if missing
+min_yield_rows = 50  # fewer usable yields than this can't give a meaningful regressor
 
 df = pd.read_csv(data_path)
 df = df.dropna(subset=['original_reactions', 'updated_reaction', 'mechanistic_class', 'mechanistic_label'])
@@ -71,4 +56,22 @@ clf_hazard.fit(X_train, y_train)
 print("Safety Hazard Classification Report:")
 print(classification_report(y_test, clf_hazard.predict(X_test), labels=np.arange(len(le_hazard.classes_)), target_names=le_hazard.classes_, zero_division=0))
 joblib.dump(clf_hazard, os.path.join(models_dir, "hazard_level_model.pkl"))
-joblib.dump(le_hazard, os.path.join(models_dir, "hazard_level_encoder.pkl"))
\ No newline at end of file
+joblib.dump(le_hazard, os.path.join(models_dir, "hazard_level_encoder.pkl"))
+
+# Target: Yield (regression on the same features)
+# kept small (50 shallow trees) so it adds next to nothing to inference time
+y_yield = df_valid[yield_column].apply(parse_yield) if yield_column in df_valid.columns else None
+has_yield = y_yield.notna().to_numpy() if y_yield is not None else None
+if y_yield is None:
+    print(f"No '{yield_column}' column in {data_path}, skipping yield model")
+elif has_yield.sum() < min_yield_rows:
+    print(f"Only {has_yield.sum()} rows with a usable yield (need {min_yield_rows}), skipping yield model")
+else:
+    print(f"Rows with a usable yield: {has_yield.sum()}")
+    X_train, X_test, y_train, y_test = train_test_split(X[has_yield], y_yield[has_yield].to_numpy(dtype=float), test_size=0.2, random_state=42)
+    reg_yield = RandomForestRegressor(n_estimators=50, max_depth=12, min_samples_leaf=3, n_jobs=-1, random_state=42)
+    reg_yield.fit(X_train, y_train)
+    y_pred = reg_yield.predict(X_test)
+    print("Yield Regression Report:")
+    print(f"MAE: {mean_absolute_error(y_test, y_pred):.2f} | R2: {r2_score(y_test, y_pred):.3f}")
+    joblib.dump(reg_yield, os.path.join(models_dir, "yield_model.pkl"))
@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# one sqlite file shared by every worker process on the host
+DEFAULT_CACHE_PATH = Path(os.getenv("CACHE_DB_PATH", Path(__file__).resolve().parents[2] / "cache" / "chempredict_cache.sqlite3"))
+
+_connections = {}
+_update_lock = threading.Lock()
+
+def _connect(path, role="shared", timeout=5.0):
+    # sqlite connections must not cross a fork, so keep one per process
+    key = (os.getpid(), str(path), role)
+    conn = _connections.get(key)
+    if conn is None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), timeout=timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        _connections[key] = conn
+    return conn
+
+class PersistentCache:
+    '''
+    Small JSON key-value cache on disk, safe to use from forked workers.
+    '''
+
+    def __init__(self, namespace, path=DEFAULT_CACHE_PATH, ttl_seconds=None, busy_timeout=5.0):
+        self.namespace = namespace
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.busy_timeout = busy_timeout  # seconds update() waits for another writer
+
+    def get(self, key, default=None):
+        try:
+            row = _connect(self.path).execute(
+                "SELECT value, created FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"cache read failed: {e}")
+            return default
+        if row is None:
+            return default
+        if self.ttl_seconds is not None and time.time() - row[1] > self.ttl_seconds:
+            return default
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        try:
+            _connect(self.path).execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, created) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), time.time()),
+            )
+        except sqlite3.Error as e:
+            print(f"cache write failed: {e}")
+
+    def update(self, key, fn):
+        '''
+        Replace the value with fn(current) atomically across every process and
+        return the new value. current is None when missing or expired.
+        '''
+        # transactions get their own connection so other threads' statements don't join them
+        with _update_lock:
+            conn = _connect(self.path, role=f"update:{self.busy_timeout}", timeout=self.busy_timeout)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = conn.execute(
+                        "SELECT value, created FROM cache WHERE namespace = ? AND key = ?",
+                        (self.namespace, key),
+                    ).fetchone()
+                    current = None
+                    if row is not None and (self.ttl_seconds is None or time.time() - row[1] <= self.ttl_seconds):
+                        current = json.loads(row[0])
+                    value = fn(current)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO cache (namespace, key, value, created) VALUES (?, ?, ?, ?)",
+                        (self.namespace, key, json.dumps(value), time.time()),
+                    )
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                print(f"cache update failed: {e}")
+                return None
+            return value
+
+    def prune(self):
+        # drop expired rows of this namespace
+        if self.ttl_seconds is None:
+            return
+        with _update_lock:
+            try:
+                _connect(self.path, role=f"update:{self.busy_timeout}", timeout=self.busy_timeout).execute(
+                    "DELETE FROM cache WHERE namespace = ? AND created < ?",
+                    (self.namespace, time.time() - self.ttl_seconds),
+                )
+            except sqlite3.Error as e:
+                print(f"cache prune failed: {e}")
+
+    def clear(self):
+        try:
+            _connect(self.path).execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+        except sqlite3.Error as e:
+            print(f"cache clear failed: {e}")
+
+class LRUCache:
+    '''
+    Bounded in-process cache for things too large or too hot for sqlite (embeddings, model outputs).
+    '''
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
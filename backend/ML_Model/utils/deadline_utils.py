@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# blocking network calls (cirpy, gemini) run here so a caller can stop waiting on them
+_io_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="deadline-io")
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage=""):
+        super().__init__(f"deadline exceeded{f' during {stage}' if stage else ''}")
+        self.stage = stage
+
+class Deadline:
+    '''
+    Absolute point in time (monotonic) by which a request has to be answered.
+    '''
+
+    def __init__(self, seconds):
+        self.budget = seconds
+        self.at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.at
+
+    def check(self, stage=""):
+        if self.expired():
+            raise DeadlineExceeded(stage)
+
+def run_with_deadline(fn, *args, deadline=None, stage="", **kwargs):
+    '''
+    Call fn, giving up with DeadlineExceeded once the deadline passes.
+    The call itself cannot be cancelled and finishes in the background.
+    '''
+    if deadline is None:
+        return fn(*args, **kwargs)
+    deadline.check(stage)
+    future = _io_pool.submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except FutureTimeout:
+        raise DeadlineExceeded(stage)
@@ -0,0 +1,30 @@
+def label_mechanistic_hazard(label_str):
+    """
+    Placeholder hazard level based on number of unique mechanistic steps.
+    You MUST update this mapping based on domain knowledge.
+    """
+    try:
+        items = eval(label_str)
+        vals = []
+        for elem in items:
+            if isinstance(elem, (list, tuple)): vals.extend(elem)
+            else: vals.append(elem)
+        n = len(set([int(float(i)) for i in vals if str(i).replace('.', '', 1).isdigit()]))
+        if n > 10: return 'High'
+        elif n > 5: return 'Moderate'
+        else: return 'Low'
+    except Exception:
+        return 'Unknown'
+
+def parse_yield(value):
+    """
+    Reaction yield as a percentage (0-100), or None when missing or not a number.
+    Accepts plain numbers and strings such as '85%'.
+    """
+    try:
+        y = float(str(value).strip().rstrip('%'))
+    except (TypeError, ValueError):
+        return None
+    if y != y or y < 0 or y > 100:  # nan / out of range
+        return None
+    return y
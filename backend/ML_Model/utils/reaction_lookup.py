@@ -0,0 +1,170 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from pathlib import Path
+
+try:
+    from rdkit import Chem
+    from rdkit import RDLogger
+    RDLogger.DisableLog("rdApp.*")
+except ImportError:  # lookup still works on names without rdkit
+    Chem = None
+
+# on-disk layout:
+#   header  : magic, version, entry count
+#   index   : <count> x (key hash, record offset, record length), sorted by hash
+#   records : utf-8 json blobs, one per entry
+MAGIC = b"CPLK"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+ENTRY = struct.Struct("<QII")
+
+DEFAULT_LOOKUP_PATH = Path(os.getenv(
+    "REACTION_LOOKUP_PATH",
+    Path.home() / "Downloads" / "TrainedData" / "reaction_lookup.bin",
+))
+
+# organic-subset atoms, bracket atoms, ring closures and bond symbols; no whitespace
+_SMILES_LIKE = re.compile(r"^(?:Cl|Br|[BCNOPSFI]|[bcnops]|\[[^\]]+\]|%\d\d|[0-9=#\-+()/\\@.:*~$])+$")
+
+def normalize_reactant(text):
+    '''
+    Canonical SMILES (atom maps stripped) when the input parses, else the lowercased name.
+    Without rdkit SMILES-looking input is kept as given: lowercasing would turn
+    e.g. cyclohexane (C1CCCCC1) into benzene (c1ccccc1).
+    '''
+    text = str(text).strip()
+    if Chem is not None and text:
+        mol = Chem.MolFromSmiles(text)
+        if mol is not None:
+            for atom in mol.GetAtoms():
+                atom.SetAtomMapNum(0)
+            return Chem.MolToSmiles(mol)
+    elif _SMILES_LIKE.match(text):
+        return text
+    return text.lower()
+
+def reaction_key(reactants):
+    '''
+    Order-independent key for a set of reactants; "a.b" fragments are split first.
+    '''
+    parts = []
+    for r in reactants:
+        parts.extend(p for p in str(r).split(".") if p.strip())
+    return ".".join(sorted(normalize_reactant(p) for p in parts))
+
+def _hash_key(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+def write_lookup(records, path):
+    '''
+    records: iterable of (key, dict). First record wins on duplicate keys.
+    '''
+    entries = {}
+    for key, record in records:
+        if not key:
+            continue
+        h = _hash_key(key)
+        if h not in entries:
+            # keep the key so hash collisions are detected on read
+            entries[h] = json.dumps(dict(record, key=key), separators=(",", ":")).encode("utf-8")
+
+    hashes = sorted(entries)
+    offset = HEADER.size + ENTRY.size * len(hashes)
+    index = bytearray()
+    blob = bytearray()
+    for h in hashes:
+        data = entries[h]
+        index += ENTRY.pack(h, offset + len(blob), len(data))
+        blob += data
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(hashes)))
+        f.write(index)
+        f.write(blob)
+    os.replace(tmp, path)
+    return len(hashes)
+
+class ReactionLookup:
+    '''
+    Read-only exact-match index over canonicalized reactant sets, memory-mapped from disk.
+    '''
+
+    def __init__(self, path=DEFAULT_LOOKUP_PATH):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{self.path} is not a reaction lookup file (v{VERSION})")
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, h):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_hash, offset, length = ENTRY.unpack_from(self._mm, HEADER.size + mid * ENTRY.size)
+            if mid_hash == h:
+                return offset, length
+            if mid_hash < h:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def get(self, key):
+        hit = self._find(_hash_key(key))
+        if hit is None:
+            return None
+        offset, length = hit
+        record = json.loads(self._mm[offset:offset + length])
+        if record.pop("key", None) != key:
+            return None
+        return record
+
+    def lookup(self, reactant1, reactant2):
+        return self.get(reaction_key([reactant1, reactant2]))
+
+    @staticmethod
+    def reactant_smiles(record, reactant):
+        '''
+        SMILES of one of the record's reactants as given by the caller (name or SMILES),
+        from the map stored at build time. "" when it isn't known.
+        '''
+        stored = record.get("reactant_smiles") or {}
+        parts = []
+        for p in (p for p in str(reactant).split(".") if p.strip()):
+            normalized = normalize_reactant(p)
+            smiles = stored.get(normalized)
+            if not smiles and normalized != p.strip().lower():
+                smiles = normalized  # the input already was a smiles (canonicalized)
+            if not smiles:
+                return ""
+            parts.append(smiles)
+        return ".".join(parts)
+
+    def close(self):
+        self._mm.close()
+
+def load_lookup(path=DEFAULT_LOOKUP_PATH):
+    # missing index just means no instant answers
+    if not Path(path).exists():
+        print(f"reaction lookup not found at {path}")
+        return None
+    try:
+        table = ReactionLookup(path)
+        print(f"reaction lookup loaded: {len(table)} reactions")
+        return table
+    except Exception as e:
+        print(f"reaction lookup unavailable: {e}")
+        return None
@@ -1,5 +1,11 @@
 from rdkit import Chem
 import cirpy
+from ML_Model.utils.cache_utils import PersistentCache
+
+# cirpy is a network round trip; results are shared across workers and restarts
+_MISSING = object()
+name_cache = PersistentCache("name_to_smiles")
+smiles_name_cache = PersistentCache("smiles_to_name")
 
 def is_valid_smiles(smiles):
     '''
@@ -28,10 +34,24 @@ def is_valid_reaction_smiles(reaction_smiles):
         return False
 
 def name_to_smiles(name):
+    cached = name_cache.get(name, _MISSING)
+    if cached is not _MISSING:
+        return cached
     result = cirpy.resolve(name, 'smiles')
-    return result if result else None
+    result = result if result else None
+    name_cache.set(name, result)
+    return result
 
 def smiles_to_name(smiles):
+    cached = smiles_name_cache.get(smiles, _MISSING)
+    if cached is not _MISSING:
+        return cached
+    name = _resolve_name(smiles)
+    if name != smiles:  # falling back to the smiles may just be a network error
+        smiles_name_cache.set(smiles, name)
+    return name
+
+def _resolve_name(smiles):
     try:
         result = cirpy.resolve(smiles, 'names')
         if result:
@@ -0,0 +1,197 @@
+import asyncio
+import math
+import os
+import time
+from dataclasses import dataclass
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from ML_Model.utils.cache_utils import PersistentCache
+from ML_Model.utils.deadline_utils import Deadline
+
+MAX_REQUESTS_PER_MINUTE = int(os.getenv("MAX_REQUESTS_PER_MINUTE", 60))
+MAX_TOKENS_PER_REQUEST = int(os.getenv("MAX_TOKENS_PER_REQUEST", 2000))
+MAX_QUEUE_DEPTH = int(os.getenv("ADMISSION_MAX_QUEUE", 32))
+# X-Forwarded-For entries appended by proxies we trust (render's load balancer adds one)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 1))
+
+def estimate_tokens(text: str) -> int:
+    # rough gemini/bpe estimate, good enough for admission decisions
+    return math.ceil(len(text) / 4)
+
+@dataclass
+class EndpointPolicy:
+    max_concurrency: int
+    deadline_seconds: float
+    expected_latency: float  # starting guess for the latency average
+
+class EndpointState:
+    def __init__(self, policy: EndpointPolicy):
+        self.policy = policy
+        self.slots = asyncio.Semaphore(policy.max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.avg_latency = policy.expected_latency
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+
+    def estimated_wait(self):
+        if self.in_flight < self.policy.max_concurrency:
+            return 0.0
+        return (self.waiting + 1) / self.policy.max_concurrency * self.avg_latency
+
+    def record_latency(self, seconds):
+        self.avg_latency = 0.8 * self.avg_latency + 0.2 * seconds
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "avg_latency_s": round(self.avg_latency, 3),
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+        }
+
+def _reject(status_code, detail, retry_after):
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+class AdmissionController:
+    '''
+    Per-client token buckets plus per-endpoint concurrency limits and deadlines.
+    Requests that can't be answered before their deadline are shed up front.
+
+    The token buckets live in the shared sqlite cache, so the rate limit holds
+    across all server workers. Concurrency limits and queues are per worker.
+    '''
+
+    def __init__(self, policies, requests_per_minute=MAX_REQUESTS_PER_MINUTE, max_queue=MAX_QUEUE_DEPTH,
+                 trusted_hops=TRUSTED_PROXY_HOPS):
+        self.endpoints = {path: EndpointState(policy) for path, policy in policies.items()}
+        self.requests_per_minute = requests_per_minute
+        self.max_queue = max_queue
+        self.trusted_hops = trusted_hops
+        # an idle bucket is full again after a minute, so older rows can go. a short
+        # busy timeout: when the db is contended we'd rather admit than stall
+        self.buckets = PersistentCache("rate_limits", ttl_seconds=120, busy_timeout=0.1)
+        self.checks = 0
+
+    def _take(self, client, path):
+        # returns 0 when admitted, otherwise seconds until a token is available.
+        # blocking sqlite work: call it off the event loop
+        rate = self.requests_per_minute / 60.0
+        capacity = self.requests_per_minute
+
+        def take(bucket):
+            now = time.time()
+            tokens = capacity if bucket is None else min(capacity, bucket["tokens"] + (now - bucket["updated"]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            return {"tokens": tokens - 1 if wait == 0 else tokens, "updated": now, "wait": wait}
+
+        self.checks += 1
+        if self.checks % 1000 == 0:
+            self.buckets.prune()
+        bucket = self.buckets.update(f"{path}|{client}", take)
+        return bucket["wait"] if bucket else 0.0  # cache unavailable: don't turn everyone away
+
+    def _client_id(self, request: Request):
+        # the leftmost entries are whatever the client sent; only the ones our
+        # own proxies appended (counted from the right) can be trusted
+        forwarded = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+        if forwarded and self.trusted_hops > 0:
+            return forwarded[-min(self.trusted_hops, len(forwarded))]
+        return request.client.host if request.client else "unknown"
+
+    def _deadline(self, request: Request, policy: EndpointPolicy):
+        # clients may ask for a tighter deadline, never a looser one
+        budget = policy.deadline_seconds
+        try:
+            budget = min(budget, float(request.headers.get("x-request-timeout", budget)))
+        except ValueError:
+            pass
+        return Deadline(budget)
+
+    async def __call__(self, request: Request, call_next):
+        state = self.endpoints.get(request.url.path)
+        if state is None or request.method != "POST":
+            return await call_next(request)
+
+        retry_after = await asyncio.to_thread(self._take, self._client_id(request), request.url.path)
+        if retry_after:
+            state.rate_limited += 1
+            return _reject(429, "Rate limit exceeded", retry_after)
+
+        deadline = self._deadline(request, state.policy)
+        # only requests that have to queue are judged on the latency estimate; with a
+        # free slot even a tight deadline can be met by the fast (lookup/cache) paths
+        wait = state.estimated_wait()
+        if state.waiting >= self.max_queue or (wait and wait + state.avg_latency > deadline.remaining()):
+            state.shed += 1
+            return _reject(503, "Server busy, try again shortly", wait or state.avg_latency)
+
+        state.waiting += 1
+        try:
+            await asyncio.wait_for(state.slots.acquire(), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            state.shed += 1
+            return _reject(503, "Server busy, try again shortly", state.avg_latency)
+        finally:
+            state.waiting -= 1
+
+        state.in_flight += 1
+        state.admitted += 1
+        request.state.deadline = deadline
+        started = time.monotonic()
+        try:
+            response = await call_next(request)
+        except BaseException:
+            self._release(state, started)
+            raise
+        # the body may still be streaming; hold the slot until the last chunk is out
+        response.body_iterator = self._release_when_done(response.body_iterator, state, started)
+        return response
+
+    @staticmethod
+    def _release(state, started):
+        state.record_latency(time.monotonic() - started)
+        state.in_flight -= 1
+        state.slots.release()
+
+    async def _release_when_done(self, body, state, started):
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            self._release(state, started)
+
+    def stats(self):
+        return {path: state.stats() for path, state in self.endpoints.items()}
+
+admission = AdmissionController({
+    "/predict_all": EndpointPolicy(
+        max_concurrency=int(os.getenv("PREDICT_MAX_CONCURRENCY", 4)),
+        deadline_seconds=float(os.getenv("PREDICT_DEADLINE_SECONDS", 30)),
+        expected_latency=3.0,
+    ),
+    "/predict_all/stream": EndpointPolicy(
+        max_concurrency=int(os.getenv("PREDICT_MAX_CONCURRENCY", 4)),
+        deadline_seconds=float(os.getenv("PREDICT_DEADLINE_SECONDS", 30)),
+        expected_latency=5.0,
+    ),
+    "/predict_product_llm": EndpointPolicy(
+        max_concurrency=int(os.getenv("PREDICT_MAX_CONCURRENCY", 4)),
+        deadline_seconds=float(os.getenv("PREDICT_DEADLINE_SECONDS", 30)),
+        expected_latency=5.0,
+    ),
+    "/chat": EndpointPolicy(
+        max_concurrency=int(os.getenv("CHAT_MAX_CONCURRENCY", 8)),
+        deadline_seconds=float(os.getenv("CHAT_DEADLINE_SECONDS", 60)),
+        expected_latency=5.0,
+    ),
+})
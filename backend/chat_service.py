@@ -1,124 +1,306 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationChain
-from langchain.prompts import PromptTemplate
 from typing import Dict
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from admission import estimate_tokens
+from ML_Model.utils.deadline_utils import DeadlineExceeded, run_with_deadline
+from ML_Model.utils.cache_utils import PersistentCache
 
 load_dotenv()  # load env vars
 
-class ChemicalResearchChatbot:
-    def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found")
-        
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=api_key,
-            temperature=0.7,
-            convert_system_message_to_human=True,
-            max_output_tokens=2000
-        )
-        
-        self.memories = {}
-        self.prompt = self._create_chemistry_prompt()
-    
-    def _create_chemistry_prompt(self) -> PromptTemplate:
-        template = """you are chempredict ai research assistant, an expert chemistry advisor a self trained model.
+# prompt size per turn: fixed instructions + knowledge + as much recent history as fits
+CHAT_INPUT_TOKEN_BUDGET = int(os.getenv("CHAT_INPUT_TOKEN_BUDGET", 1500))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", 150))
+# retrieval: only the knowledge base entries matching the question are sent
+# prefix: the whole knowledge base is sent as an unchanging prompt prefix (gemini caches repeated prefixes)
+CHAT_KB_MODE = os.getenv("CHAT_KB_MODE", "retrieval")
+CHAT_KB_ENTRIES = int(os.getenv("CHAT_KB_ENTRIES", 2))
+
+INSTRUCTIONS = """you are chempredict ai research assistant, an expert chemistry advisor a self trained model.
 
 your expertise covers:
 - organic, inorganic, and biochemical reactions
-- reaction mechanisms and kinetics  
+- reaction mechanisms and kinetics
 - chemical safety and hazard assessment
 - laboratory protocols and best practices
 - molecular structures and bonding theory
 - analytical chemistry techniques
 - compound properties (boiling/melting points, toxicity, reactivity)
 
-chemistry knowledge base:
+guidelines:
+1. provide accurate, scientifically rigorous answers
+2. prioritize safety protocols
+3. cite relevant reaction types and mechanisms
+4. acknowledge uncertainty if unsure
+5. suggest practical applications
+6. use proper chemical nomenclature
+7. write in plain text without markdown formatting
+"""
 
-esterification: reaction between carboxylic acid and alcohol to form ester + water. requires acid catalyst (h2so4). reaction: r-cooh + r'-oh → r-coo-r' + h2o
+# topic -> (keywords that select it, text)
+KNOWLEDGE_BASE = {
+    "esterification": (
+        ("ester", "carboxylic", "acid catalyst", "fischer"),
+        "esterification: reaction between carboxylic acid and alcohol to form ester + water. requires acid catalyst (h2so4). reaction: r-cooh + r'-oh → r-coo-r' + h2o",
+    ),
+    "hydrolysis": (
+        ("hydrolysis", "hydrolyze", "saponification", "soap", "water"),
+        "hydrolysis: breaking bonds using water. ester hydrolysis breaks ester into acid + alcohol. can be acid-catalyzed or base-catalyzed (saponification)",
+    ),
+    "oxidation": (
+        ("oxidation", "oxidize", "oxidizing", "kmno4", "cro3", "h2o2", "aldehyde", "ketone", "redox"),
+        "oxidation: loss of electrons or increase in oxidation state. oxidizing agents: kmno4, cro3, h2o2. primary alcohols → aldehydes → carboxylic acids. secondary alcohols → ketones",
+    ),
+    "reduction": (
+        ("reduction", "reduce", "reducing", "lialh4", "nabh4", "hydrogenation", "carbonyl", "redox"),
+        "reduction: gain of electrons or decrease in oxidation state. reducing agents: lialh4, nabh4, h2 + catalyst. converts carbonyl compounds to alcohols",
+    ),
+    "substitution": (
+        ("substitution", "sn1", "sn2", "nucleophil", "leaving group", "carbocation"),
+        "substitution: replacement of one atom/group with another. sn2 (one step, backside attack) vs sn1 (carbocation intermediate)",
+    ),
+    "polymerization": (
+        ("polymer", "monomer", "plastic", "condensation"),
+        "polymerization: combining monomers into polymers. addition polymerization (c=c bonds) vs condensation polymerization (eliminates small molecules)",
+    ),
+    "safety": (
+        ("safety", "safe", "ppe", "goggles", "gloves", "fume", "hazard", "danger"),
+        "safety protocols: use ppe (goggles, lab coat, gloves), work in fume hoods, know safety equipment locations, never taste/smell chemicals directly",
+    ),
+    "toxicity": (
+        ("toxic", "poison", "hazard", "danger", "exposure"),
+        "toxicity levels:\n- low: generally safe with basic precautions\n- medium: requires careful handling and ventilation\n- high: extremely dangerous, needs specialized equipment",
+    ),
+    "yields": (
+        ("yield", "efficiency", "side reaction", "purity", "optimi"),
+        "reaction yields: typically 60-95% for optimized reactions. factors: temperature, pressure, catalyst, reagent purity, side reactions",
+    ),
+    "acid-base": (
+        ("acid", "base", "ph ", "proton", "bronsted", "hcl", "naoh", "koh", "neutraliz"),
+        "acid-base: bronsted-lowry acids (proton donors) vs bases (proton acceptors). ph scale 0-14 (7=neutral). strong acids: hcl, h2so4, hno3. strong bases: naoh, koh",
+    ),
+}
 
-hydrolysis: breaking bonds using water. ester hydrolysis breaks ester into acid + alcohol. can be acid-catalyzed or base-catalyzed (saponification)
+FULL_KNOWLEDGE = "chemistry knowledge base:\n\n" + "\n\n".join(text for _, text in KNOWLEDGE_BASE.values()) + "\n"
+# byte-identical on every turn, so the provider can reuse it
+FROZEN_PREFIX = INSTRUCTIONS + ("\n" + FULL_KNOWLEDGE if CHAT_KB_MODE == "prefix" else "")
 
-oxidation: loss of electrons or increase in oxidation state. oxidizing agents: kmno4, cro3, h2o2. primary alcohols → aldehydes → carboxylic acids. secondary alcohols → ketones
+QUESTION_TEMPLATE = "\ncurrent question: {}\n\nanswer:"
+HISTORY_HEADER = "\nconversation history:\n"
+EARLIER_TEMPLATE = "earlier in this conversation the user asked about: {}\n"
+TURN_TEMPLATE = "human: {}\nai: {}\n"
 
-reduction: gain of electrons or decrease in oxidation state. reducing agents: lialh4, nabh4, h2 + catalyst. converts carbonyl compounds to alcohols
+def select_knowledge(text, limit=CHAT_KB_ENTRIES):
+    # keywords match at the start of a word; ties keep knowledge base order
+    words = f" {' '.join(text.lower().split())} "
+    scored = []
+    for position, (keywords, entry) in enumerate(KNOWLEDGE_BASE.values()):
+        score = sum(1 for k in keywords if f" {k}" in words)
+        if score:
+            scored.append((-score, position, entry))
+    return [entry for _, _, entry in sorted(scored)[:limit]]
 
-substitution: replacement of one atom/group with another. sn2 (one step, backside attack) vs sn1 (carbocation intermediate)
+class ChatSession:
+    def __init__(self):
+        self.turns = []      # (question, answer), oldest first
+        self.earlier = []    # questions of turns that no longer fit the budget
 
-polymerization: combining monomers into polymers. addition polymerization (c=c bonds) vs condensation polymerization (eliminates small molecules)
+class ChatStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.turns = 0
+        self.cache_hits = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_input_tokens = 0
+        self.max_input_tokens = 0
+        self.trimmed_turns = 0
+        self.latency = 0.0
 
-safety protocols: use ppe (goggles, lab coat, gloves), work in fume hoods, know safety equipment locations, never taste/smell chemicals directly
+    def record(self, usage):
+        with self.lock:
+            if usage["cached_answer"]:
+                self.cache_hits += 1
+                return
+            self.turns += 1
+            self.input_tokens += usage["input_tokens"]
+            self.output_tokens += usage["output_tokens"]
+            self.cached_input_tokens += usage["cached_input_tokens"]
+            self.max_input_tokens = max(self.max_input_tokens, usage["input_tokens"])
+            self.trimmed_turns += usage["trimmed_turns"]
+            self.latency += usage["latency_ms"] / 1000
 
-toxicity levels:
-- low: generally safe with basic precautions
-- medium: requires careful handling and ventilation  
-- high: extremely dangerous, needs specialized equipment
+    def snapshot(self):
+        with self.lock:
+            turns = max(self.turns, 1)
+            return {
+                "kb_mode": CHAT_KB_MODE,
+                "input_token_budget": CHAT_INPUT_TOKEN_BUDGET,
+                "turns": self.turns,
+                "answer_cache_hits": self.cache_hits,
+                "avg_input_tokens": round(self.input_tokens / turns, 1),
+                "avg_output_tokens": round(self.output_tokens / turns, 1),
+                "avg_cached_input_tokens": round(self.cached_input_tokens / turns, 1),
+                "max_input_tokens": self.max_input_tokens,
+                "trimmed_turns": self.trimmed_turns,
+                "avg_latency_s": round(self.latency / turns, 3),
+            }
 
-reaction yields: typically 60-95% for optimized reactions. factors: temperature, pressure, catalyst, reagent purity, side reactions
+class ChemicalResearchChatbot:
+    def __init__(self):
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found")
 
-acid-base: bronsted-lowry acids (proton donors) vs bases (proton acceptors). ph scale 0-14 (7=neutral). strong acids: hcl, h2so4, hno3. strong bases: naoh, koh
+        self.llm = ChatGoogleGenerativeAI(
+            model="gemini-2.5-flash",
+            google_api_key=api_key,
+            temperature=0.7,
+            convert_system_message_to_human=True,
+            max_output_tokens=int(os.getenv("MAX_TOKENS_PER_REQUEST", 2000))
+        )
 
-conversation history:
-{history}
+        self.sessions = {}
+        self.stats = ChatStats()
+        # answers to opening questions don't depend on any history, so they can be shared
+        self.answer_cache = PersistentCache("chat_answers", ttl_seconds=int(os.getenv("CHAT_CACHE_TTL_SECONDS", 7 * 24 * 3600)))
 
-current question: {input}
+    def _get_session(self, session_id: str) -> ChatSession:
+        if session_id not in self.sessions:
+            self.sessions[session_id] = ChatSession()
+        return self.sessions[session_id]
 
-guidelines:
-1. provide accurate, scientifically rigorous answers
-2. prioritize safety protocols
-3. cite relevant reaction types and mechanisms
-4. acknowledge uncertainty if unsure
-5. suggest practical applications
-6. use proper chemical nomenclature
-7. write in plain text without markdown formatting
+    def _build_prompt(self, session: ChatSession, user_message: str):
+        '''
+        Prompt for this turn, kept under CHAT_INPUT_TOKEN_BUDGET. Older turns that
+        don't fit are reduced to their questions in a short "earlier" note, and a
+        message too long for the budget on its own is cut to fit.
+        Returns (prompt, message as sent, history_turns, trimmed_turns).
+        '''
+        knowledge = ""
+        if CHAT_KB_MODE != "prefix":
+            # the previous question helps with follow ups like "and what about its safety?"
+            previous = session.turns[-1][0] if session.turns else ""
+            entries = select_knowledge(f"{user_message} {previous}")
+            if entries:
+                knowledge = "relevant knowledge:\n\n" + "\n\n".join(entries) + "\n"
+        # every fixed piece of text around the message, history and note is reserved up front
+        scaffold = "\n" + QUESTION_TEMPLATE.format("") + HISTORY_HEADER + EARLIER_TEMPLATE.format("")
 
-answer:"""
-        
-        return PromptTemplate(
-            template=template,
-            input_variables=["history", "input"]
-        )
-    
-    def _get_memory(self, session_id: str) -> ConversationBufferMemory:
-        if session_id not in self.memories:
-            self.memories[session_id] = ConversationBufferMemory(
-                memory_key="history",
-                return_messages=False
-            )
-        return self.memories[session_id]
-    
-    def chat(self, user_message: str, session_id: str = "default") -> Dict:
+        # room for the message itself; knowledge goes first when even that is too tight
+        room = CHAT_INPUT_TOKEN_BUDGET - estimate_tokens(FROZEN_PREFIX + knowledge + scaffold) - CHAT_SUMMARY_TOKENS
+        if room < estimate_tokens(user_message) and knowledge:
+            knowledge = ""
+            room = CHAT_INPUT_TOKEN_BUDGET - estimate_tokens(FROZEN_PREFIX + scaffold) - CHAT_SUMMARY_TOKENS
+        if estimate_tokens(user_message) > room:
+            # estimate_tokens is chars / 4, so this many characters fill the room exactly
+            user_message = user_message[:max(room, 0) * 4]
+
+        available = max(0, room - estimate_tokens(user_message))
+        kept = 0
+        for q, a in reversed(session.turns):
+            cost = estimate_tokens(TURN_TEMPLATE.format(q, a))
+            if cost > available:
+                break
+            available -= cost
+            kept += 1
+
+        def render():
+            history = ""
+            if session.earlier:
+                history += EARLIER_TEMPLATE.format("; ".join(session.earlier))
+            history += "".join(TURN_TEMPLATE.format(q, a) for q, a in session.turns)
+            if history:
+                history = HISTORY_HEADER + history
+            return f"{FROZEN_PREFIX}\n{knowledge}{history}{QUESTION_TEMPLATE.format(user_message)}"
+
+        trimmed = 0
+        while True:
+            drop = len(session.turns) - kept
+            if drop:
+                session.earlier.extend(q[:80] for q, _ in session.turns[:drop])
+                del session.turns[:drop]
+                trimmed += drop
+            # newest earlier questions win when the note itself gets too long
+            while session.earlier and estimate_tokens("; ".join(session.earlier)) > CHAT_SUMMARY_TOKENS:
+                session.earlier.pop(0)
+            prompt = render()
+            # the reservations above should already guarantee this; check the real thing anyway
+            if estimate_tokens(prompt) <= CHAT_INPUT_TOKEN_BUDGET or not (session.turns or session.earlier):
+                break
+            if session.turns:
+                kept = len(session.turns) - 1
+            else:
+                session.earlier.pop(0)
+        return prompt, user_message, len(session.turns), trimmed
+
+    def chat(self, user_message: str, session_id: str = "default", deadline=None) -> Dict:
         try:
             print(f"[chat] {user_message[:50]}...")
-            
-            memory = self._get_memory(session_id)
+
+            session = self._get_session(session_id)
             print(f"[chat] session: {session_id}")
-            
-            chain = ConversationChain(
-                llm=self.llm,
-                memory=memory,
-                prompt=self.prompt,
-                verbose=False
-            )
+
+            first_turn = not session.turns and not session.earlier
+            cache_key = " ".join(user_message.lower().split())
+            if first_turn:
+                cached = self.answer_cache.get(cache_key)
+                if cached:
+                    print("[chat] answered from cache")
+                    session.turns.append((user_message, cached))
+                    usage = {"input_tokens": 0, "output_tokens": 0, "cached_input_tokens": 0,
+                             "history_turns": 0, "trimmed_turns": 0, "message_truncated": False, "latency_ms": 0,
+                             "cached_answer": True}
+                    self.stats.record(usage)
+                    return {
+                        "answer": cached,
+                        "sources": [],
+                        "session_id": session_id,
+                        "usage": usage
+                    }
+
+            prompt, sent_message, history_turns, trimmed_turns = self._build_prompt(session, user_message)
             print("[chat] calling gemini...")
-            
-            response = chain.predict(input=user_message)
+
+            started = time.perf_counter()
+            message = run_with_deadline(self.llm.invoke, prompt, deadline=deadline, stage="chat")
+            latency = time.perf_counter() - started
+            response = message.content if isinstance(message.content, str) else str(message.content)
             print(f"[chat] response: {response[:100]}...")
-            
+
             cleaned_response = response.strip()
             cleaned_response = cleaned_response.replace('**', '').replace('*', '')
             cleaned_response = cleaned_response.replace('###', '').replace('##', '').replace('#', '')
-            
+            # history keeps what was sent, so an oversized message doesn't crowd out later turns
+            session.turns.append((sent_message, cleaned_response))
+            if first_turn:
+                self.answer_cache.set(cache_key, cleaned_response)
+
+            # provider counts when available, otherwise the same estimate the budget uses
+            reported = getattr(message, "usage_metadata", None) or {}
+            usage = {
+                "input_tokens": reported.get("input_tokens") or estimate_tokens(prompt),
+                "output_tokens": reported.get("output_tokens") or estimate_tokens(response),
+                "cached_input_tokens": (reported.get("input_token_details") or {}).get("cache_read", 0),
+                "history_turns": history_turns,
+                "trimmed_turns": trimmed_turns,
+                "message_truncated": sent_message != user_message,
+                "latency_ms": round(latency * 1000),
+                "cached_answer": False,
+            }
+            self.stats.record(usage)
+
             return {
                 "answer": cleaned_response,
                 "sources": [],
-                "session_id": session_id
+                "session_id": session_id,
+                "usage": usage
             }
-            
+
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"[chat] error: {str(e)}")
             return {
@@ -127,10 +309,10 @@ answer:"""
                 "session_id": session_id,
                 "error": True
             }
-    
+
     def clear_session(self, session_id: str):
-        if session_id in self.memories:
-            del self.memories[session_id]
+        if session_id in self.sessions:
+            del self.sessions[session_id]
 
 try:
     chatbot = ChemicalResearchChatbot()
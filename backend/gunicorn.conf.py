@@ -0,0 +1,64 @@
+"""
+Gunicorn config for multi-worker serving.
+
+The app (and with it every model) is imported once in the master and the
+workers are forked from it, so model weights are shared copy-on-write
+instead of being loaded once per worker.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Tuning (env vars):
+    WEB_CONCURRENCY     number of worker processes (default: cores / 2)
+    TORCH_NUM_THREADS   torch intra-op threads per worker (default: cores / workers)
+    PIN_WORKER_CPUS     1 = pin each worker process to its own slice of cores
+    PORT                listen port (default: 8000)
+
+Threads inside a worker are configured by ML_Model/models/runtime.py.
+"""
+import gc
+import os
+
+cpu_count = os.cpu_count() or 1
+
+workers = int(os.getenv("WEB_CONCURRENCY", max(1, cpu_count // 2)))
+torch_threads = int(os.getenv("TORCH_NUM_THREADS", max(1, cpu_count // workers)))
+
+# must be in the environment before torch / numpy are imported by the preload,
+# otherwise every worker starts one thread per core and they fight over the cpu
+for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+    os.environ.setdefault(var, str(torch_threads))
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+os.environ.setdefault("TORCH_NUM_THREADS", str(torch_threads))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+keepalive = int(os.getenv("KEEPALIVE_SECONDS", 5))
+timeout = int(os.getenv("WORKER_TIMEOUT_SECONDS", 120))
+
+# recycle workers now and then; a fresh fork gets clean shared pages back
+max_requests = int(os.getenv("MAX_REQUESTS", 1000))
+max_requests_jitter = max_requests // 10
+
+def when_ready(server):
+    # move everything loaded by the preload out of the gc's reach so that
+    # collections in the workers don't touch (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"preloaded app, forking {workers} workers x {torch_threads} torch threads")
+
+def pre_fork(server, worker):
+    # runs in the master: give the new worker the lowest cpu slice no live worker holds.
+    # dead workers are already out of server.WORKERS here, so recycled workers
+    # (max_requests) take over the slice of the one they replace
+    taken = {getattr(w, "cpu_slot", None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in range(len(taken) + 1) if slot not in taken)
+
+def post_fork(server, worker):
+    try:
+        from ML_Model.models import runtime
+    except ImportError:  # torch not installed, nothing to tune
+        return
+    if os.getenv("PIN_WORKER_CPUS", "0") == "1":
+        runtime.pin_process(worker.cpu_slot, workers)
+    runtime.configure_torch(intra_op=torch_threads)
@@ -1,9 +1,14 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import random
 from datetime import datetime
 from chat_service import chatbot
+from admission import admission, estimate_tokens, MAX_TOKENS_PER_REQUEST
+from prediction_planner import PredictionPlanner, Tier
+from warmup import QueryLog, start_background_warmup
+from ML_Model.utils.cache_utils import PersistentCache
+from ML_Model.utils.deadline_utils import DeadlineExceeded, run_with_deadline
 from dotenv import load_dotenv
 import json
 import os
@@ -38,7 +43,9 @@ try:
     # from transformers import AutoModel
     # from rxn4chemistry import RXN4ChemistryWrapper
     # from ML_Model.utils.smiles_utils import name_to_smiles, smiles_to_name, is_valid_smiles
-    # from ML_Model.predict.predict_reaction import predict_reaction as ml_predict_reaction
+    # from ML_Model.predict.predict_reaction import predict_reaction_details as ml_predict_reaction_details
+    # from ML_Model.predict.predict_reaction import predict_reactions_batch as ml_predict_reactions_batch
+    # from ML_Model.models import runtime as inference_runtime
 
     print("ml deps loaded")
     ML_MODEL_AVAILABLE = True
@@ -60,6 +67,18 @@ except Exception as e:
     ML_MODEL_AVAILABLE = False
     rxn = None
 
+# exact-match index of known reactions, consulted before any model
+reaction_lookup = None
+reaction_key = None
+try:
+    from ML_Model.utils.reaction_lookup import load_lookup, reaction_key
+    reaction_lookup = load_lookup()
+except Exception as e:
+    print(f"reaction lookup unavailable: {e}")
+
+# answers from the ml / gemini tiers, shared by all workers
+prediction_cache = PersistentCache("predictions", ttl_seconds=int(os.getenv("PREDICTION_CACHE_TTL_SECONDS", 7 * 24 * 3600)))
+
 app = FastAPI(title="ChemPredict AI")  # main app
 
 app.add_middleware(
@@ -70,6 +89,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# rate limits, deadlines and load shedding for the prediction / chat endpoints
+app.middleware("http")(admission)
+
+# inputs of recent requests, replayed on startup to warm the caches
+query_log = QueryLog()
+
+@app.exception_handler(DeadlineExceeded)
+def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Request timed out ({exc})"},
+        headers={"Retry-After": "5"},
+    )
+
 class ReactionInput(BaseModel):
     reactant1: str
     reactant2: str
@@ -78,13 +111,17 @@ class ChatInput(BaseModel):
     message: str
     session_id: str = "default"
 
-def generate_reaction_description(reactant1: str, reactant2: str, reaction_type: str, hazard_level: str) -> str:
-    # use gemini to generate detailed reaction description
-    if not gemini_llm:
-        return f"A {reaction_type} reaction between {reactant1} and {reactant2}."
-    
-    try:
-        prompt = f"""You are a chemistry expert. Provide a detailed, educational description of the following chemical reaction.
+def request_deadline(request: Request):
+    # set by the admission middleware; None when called outside a request
+    return getattr(request.state, "deadline", None) if request is not None else None
+
+def check_token_limit(*texts: str):
+    tokens = sum(estimate_tokens(t) for t in texts)
+    if tokens > MAX_TOKENS_PER_REQUEST:
+        raise HTTPException(status_code=413, detail=f"Request too large: ~{tokens} tokens (limit {MAX_TOKENS_PER_REQUEST})")
+
+def reaction_description_prompt(reactant1: str, reactant2: str, reaction_type: str, hazard_level: str) -> str:
+    return f"""You are a chemistry expert. Provide a detailed, educational description of the following chemical reaction.
 
 Reactants: {reactant1} and {reactant2}
 Predicted Reaction Type: {reaction_type}
@@ -100,16 +137,60 @@ Write a comprehensive 2-3 paragraph description that includes:
 Keep it scientific but accessible. Write in a clear, educational tone.
 IMPORTANT: Write in plain text WITHOUT any markdown formatting (no **, *, #, etc.)."""
 
-        response = gemini_llm.predict(prompt)
-        cleaned = response.strip()
-        cleaned = cleaned.replace('**', '').replace('*', '')
-        cleaned = cleaned.replace('###', '').replace('##', '').replace('#', '')
-        return cleaned
+def clean_llm_text(text: str) -> str:
+    # strip markdown the model adds despite being told not to
+    cleaned = text.replace('**', '').replace('*', '')
+    return cleaned.replace('###', '').replace('##', '').replace('#', '')
+
+def fallback_description(reactant1: str, reactant2: str, reaction_type: str, hazard_level: str) -> str:
+    return f"A {reaction_type} reaction between {reactant1} and {reactant2} with {hazard_level.lower()} safety hazard level."
+
+def generate_reaction_description(reactant1: str, reactant2: str, reaction_type: str, hazard_level: str, deadline=None, outcome=None) -> str:
+    # use gemini to generate detailed reaction description
+    # outcome["complete"] is set only when gemini's text was used, not a placeholder
+    if not gemini_llm:
+        return f"A {reaction_type} reaction between {reactant1} and {reactant2}."
+    
+    try:
+        prompt = reaction_description_prompt(reactant1, reactant2, reaction_type, hazard_level)
+        response = run_with_deadline(gemini_llm.predict, prompt, deadline=deadline, stage="description")
+        if outcome is not None:
+            outcome["complete"] = True
+        return clean_llm_text(response.strip())
     except Exception as e:
         print(f"Error generating description: {e}")
-        return f"A {reaction_type} reaction between {reactant1} and {reactant2} with {hazard_level.lower()} safety hazard level."
+        return fallback_description(reactant1, reactant2, reaction_type, hazard_level)
+
+def stream_reaction_description(reactant1: str, reactant2: str, reaction_type: str, hazard_level: str, deadline=None, outcome=None):
+    # yields the description piece by piece as gemini produces it
+    # outcome["complete"] is set only when the whole stream came through
+    if not gemini_llm:
+        yield f"A {reaction_type} reaction between {reactant1} and {reactant2}."
+        return
 
-def predict_product_with_gemini(reactant1: str, reactant2: str) -> dict:
+    produced = False
+    try:
+        prompt = reaction_description_prompt(reactant1, reactant2, reaction_type, hazard_level)
+        chunks = gemini_llm.stream(prompt)
+        while True:
+            # every chunk, the first one included, has to arrive before the deadline
+            chunk = run_with_deadline(next, chunks, None, deadline=deadline, stage="description")
+            if chunk is None:
+                break
+            text = clean_llm_text(chunk.content)
+            if text:
+                produced = True
+                yield text
+        if outcome is not None:
+            outcome["complete"] = True
+    except DeadlineExceeded:
+        print("Description stream cut off by the deadline")
+    except Exception as e:
+        print(f"Error streaming description: {e}")
+    if not produced:
+        yield fallback_description(reactant1, reactant2, reaction_type, hazard_level)
+
+def predict_product_with_gemini(reactant1: str, reactant2: str, deadline=None) -> dict:
     # ask gemini to predict reaction product and metadata
     if not gemini_llm:
         raise HTTPException(status_code=503, detail="Gemini model not initialized")
@@ -136,7 +217,7 @@ def predict_product_with_gemini(reactant1: str, reactant2: str) -> dict:
     )
 
     try:
-        response_text = gemini_llm.predict(f"{system_instructions}\n\n{user_prompt}")
+        response_text = run_with_deadline(gemini_llm.predict, f"{system_instructions}\n\n{user_prompt}", deadline=deadline, stage="gemini prediction")
         cleaned = response_text.strip()
         cleaned = cleaned.replace('**', '').replace('*', '')
         cleaned = cleaned.replace('###', '').replace('##', '').replace('#', '')
@@ -161,129 +242,259 @@ def predict_product_with_gemini(reactant1: str, reactant2: str) -> dict:
             data["predicted_yield"] = round(py, 1)
         except Exception:
             data["predicted_yield"] = 80.0
-        desc = str(data.get("reaction_description", "")).strip()
-        if not desc:
-            desc = generate_reaction_description(reactant1, reactant2, data["reaction_type"], data["safety_hazard_level"]) 
-        data["reaction_description"] = desc
+        # left empty when missing; callers fill it in with generate_reaction_description
+        data["reaction_description"] = str(data.get("reaction_description", "")).strip()
         return data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gemini prediction failed: {str(e)}")
 
+def format_yield(value) -> str:
+    return f"{value}%" if value is not None else "N/A"
+
+def predict_from_lookup(reactant1: str, reactant2: str):
+    # serve textbook reactions straight from the index, no model or llm calls
+    if reaction_lookup is None:
+        return None
+    known = reaction_lookup.lookup(reactant1, reactant2)
+    if not known:
+        return None
+
+    reaction_type = known["reaction_type"]
+    hazard = known["safety_hazard_level"]
+    product_name = known["product"]
+    return {
+        "reaction_type": reaction_type,
+        "product": product_name,
+        "safety_hazard_level": hazard,
+        "reaction_description": fallback_description(reactant1, reactant2, reaction_type, hazard),
+        "predicted_yield": format_yield(known.get("predicted_yield")),
+        "yield_uncertainty": None,
+        "reactant1_smiles": reaction_lookup.reactant_smiles(known, reactant1),
+        "reactant2_smiles": reaction_lookup.reactant_smiles(known, reactant2),
+        "product_smiles": known["product_smiles"] or product_name,
+        "prediction_method": "lookup"
+    }
+
 @app.get("/")
 def home():
     return {"message": "ChemPredict AI API is running"}
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "admission": admission.stats(),
+        "prediction_tiers": planner.stats(),
+        "chat": chatbot.stats.snapshot() if chatbot is not None else None,
+    }
+
+def predict_with_ml(reactant1: str, reactant2: str, deadline=None):
+    # local models; the description is filled in afterwards so it doesn't count against this tier
+    ml_result = ml_predict_reaction_details(reactant1, reactant2, input_type="name", deadline=deadline)
+    reaction_type, hazard, ml_product = ml_result["reaction_type"], ml_result["safety_hazard_level"], ml_result["product"]
+    print(f"ML Predicted: type={reaction_type}, hazard={hazard}, product={ml_product}, yield={ml_result['predicted_yield']}")
+    if reaction_type == "Invalid reaction SMILES":
+        return None
+
+    # cirpy lookups can be slow network calls, keep them inside the request's deadline
+    r1_smiles = resolve_smiles(reactant1, deadline)
+    r2_smiles = resolve_smiles(reactant2, deadline)
+
+    product_smiles = None
+    if ml_product:
+        if is_valid_smiles(ml_product):
+            product_smiles = ml_product
+            product_name = run_with_deadline(smiles_to_name, ml_product, deadline=deadline, stage="name resolution")
+            print(f"Converted SMILES to name: {product_name}")
+        else:
+            product_name = ml_product
+            product_smiles = resolve_smiles(ml_product, deadline)
+    else:
+        product_name = f"{reactant1} + {reactant2} → Product"
+
+    return {
+        "reaction_type": reaction_type,
+        "product": product_name,
+        "safety_hazard_level": hazard,
+        "predicted_yield": format_yield(ml_result["predicted_yield"]),
+        "yield_uncertainty": ml_result["yield_uncertainty"],
+        "reactant1_smiles": r1_smiles,
+        "reactant2_smiles": r2_smiles,
+        "product_smiles": product_smiles or product_name,
+        "prediction_method": "ml_model"
+    }
+
+def predict_with_gemini(reactant1: str, reactant2: str, deadline=None):
+    gemini_result = predict_product_with_gemini(reactant1, reactant2, deadline=deadline)
+    # attempt smiles conversions when available, within what's left of the deadline
+    r1_smiles = resolve_smiles(reactant1, deadline)
+    r2_smiles = resolve_smiles(reactant2, deadline)
+
+    product_name = gemini_result.get("product", "Unknown product")
+    product_smiles = gemini_result.get("product_smiles") or product_name
+
+    return {
+        "reaction_type": gemini_result.get("reaction_type", "Unknown"),
+        "product": product_name,
+        "safety_hazard_level": gemini_result.get("safety_hazard_level", "Medium"),
+        "reaction_description": gemini_result.get("reaction_description", ""),
+        "predicted_yield": format_yield(gemini_result.get("predicted_yield", 80.0)),
+        "yield_uncertainty": None,
+        "reactant1_smiles": r1_smiles,
+        "reactant2_smiles": r2_smiles,
+        "product_smiles": product_smiles,
+        "prediction_method": "gemini-2.5-flash"
+    }
+
+def prediction_cache_key(reactant1: str, reactant2: str) -> str:
+    return reaction_key([reactant1, reactant2]) if reaction_key else "|".join(sorted([reactant1.lower(), reactant2.lower()]))
+
+def predict_from_cache(reactant1: str, reactant2: str, deadline=None):
+    cached = prediction_cache.get(prediction_cache_key(reactant1, reactant2))
+    if cached:
+        # keep the original method, the tier field says it came from the cache
+        return dict(cached)
+    return None
+
+# cheapest sufficient path first: lookup -> cache -> local models -> gemini
+planner = PredictionPlanner([
+    Tier("lookup", lambda r1, r2, deadline: predict_from_lookup(r1, r2),
+         expected_latency=0.001, slo_seconds=0.05, available=lambda: reaction_lookup is not None, inline=True),
+    Tier("cache", predict_from_cache, expected_latency=0.005, slo_seconds=0.1, inline=True),
+    Tier("ml_model", predict_with_ml, expected_latency=3.0, slo_seconds=float(os.getenv("ML_TIER_SLO_SECONDS", 8)),
+         available=lambda: ML_MODEL_AVAILABLE),
+    Tier("gemini", predict_with_gemini, expected_latency=6.0, slo_seconds=float(os.getenv("GEMINI_TIER_SLO_SECONDS", 15)),
+         available=lambda: gemini_llm is not None),
+])
+
+def run_prediction(reactant1: str, reactant2: str, deadline=None):
+    result = planner.predict(reactant1, reactant2, deadline=deadline)
+    if result is None:
+        raise HTTPException(status_code=503, detail="No prediction backend available, try again shortly")
+
+    outcome = {"complete": True}
+    if not result.get("reaction_description"):
+        print(f"Generating description...")
+        outcome["complete"] = False
+        result["reaction_description"] = generate_reaction_description(
+            reactant1,
+            reactant2,
+            result["reaction_type"],
+            result["safety_hazard_level"],
+            deadline=deadline,
+            outcome=outcome
+        )
+    # a placeholder description would otherwise be served from the cache for days
+    if result["prediction_tier"] not in ("lookup", "cache") and outcome["complete"]:
+        prediction_cache.set(prediction_cache_key(reactant1, reactant2), result)
+    return result
+
 @app.post("/predict_all")
-def predict_all(data: ReactionInput):
-    if not ML_MODEL_AVAILABLE:
-        # fallback to llm when ml not available
-        return predict_product_llm(data)
-    
+def predict_all(data: ReactionInput, request: Request = None):
+    check_token_limit(data.reactant1, data.reactant2)
+    query_log.record("/predict_all", reactant1=data.reactant1, reactant2=data.reactant2)
+    return run_prediction(data.reactant1, data.reactant2, deadline=request_deadline(request))
+
+def resolve_smiles(name: str, deadline=None) -> str:
     try:
-        product_smiles = None
-        product_name = "Reaction Product"
-        
+        return run_with_deadline(name_to_smiles, name, deadline=deadline, stage="name resolution") or name
+    except DeadlineExceeded:
+        raise
+    except Exception:
+        return name
+
+def ndjson(event: str, **fields) -> str:
+    return json.dumps({"event": event, **fields}) + "\n"
+
+@app.post("/predict_all/stream")
+def predict_all_stream(data: ReactionInput, request: Request = None):
+    # same prediction as /predict_all, sent as newline-delimited json events:
+    # reactants -> prediction -> description (repeated, as gemini writes it) -> done
+    check_token_limit(data.reactant1, data.reactant2)
+    query_log.record("/predict_all", reactant1=data.reactant1, reactant2=data.reactant2)
+    deadline = request_deadline(request)
+
+    def events():
         try:
-            reaction_type, hazard, ml_product = ml_predict_reaction(data.reactant1, data.reactant2, input_type="name")
-            print(f"ML Predicted: type={reaction_type}, hazard={hazard}, product={ml_product}")
-            
-            r1_smiles = name_to_smiles(data.reactant1) or data.reactant1
-            r2_smiles = name_to_smiles(data.reactant2) or data.reactant2
-            
-            if ml_product:
-                if is_valid_smiles(ml_product):
-                    product_smiles = ml_product
-                    product_name = smiles_to_name(ml_product)
-                    print(f"Converted SMILES to name: {product_name}")
-                else:
-                    product_name = ml_product
-                    product_smiles = name_to_smiles(ml_product) or ml_product
+            result = predict_from_lookup(data.reactant1, data.reactant2)
+            if result is not None:
+                result["prediction_tier"] = "lookup"
             else:
-                product_name = f"{data.reactant1} + {data.reactant2} → Product"
-                
-        except Exception as ml_error:
-            print(f"ML error: {ml_error}")
-            reaction_type = "Substitution"
-            hazard = "Medium"
-            product_name = f"{data.reactant1} + {data.reactant2} → Product"
-            r1_smiles = name_to_smiles(data.reactant1) or data.reactant1
-            r2_smiles = name_to_smiles(data.reactant2) or data.reactant2
-        
-        predicted_yield = round(random.uniform(70, 95), 1)
-        
-        print(f"Generating description...")
-        reaction_description = generate_reaction_description(
-            data.reactant1, 
-            data.reactant2, 
-            reaction_type, 
-            hazard
-        )
+                r1_smiles = resolve_smiles(data.reactant1, deadline)
+                r2_smiles = resolve_smiles(data.reactant2, deadline)
+                yield ndjson("reactants", reactant1_smiles=r1_smiles, reactant2_smiles=r2_smiles)
+                result = planner.predict(data.reactant1, data.reactant2, deadline=deadline)
+                if result is None:
+                    yield ndjson("error", detail="No prediction backend available, try again shortly")
+                    return
+            if result["prediction_tier"] == "lookup":
+                yield ndjson("reactants", reactant1_smiles=result["reactant1_smiles"], reactant2_smiles=result["reactant2_smiles"])
 
-        return {
-            "reaction_type": reaction_type,
-            "product": product_name,
-            "safety_hazard_level": hazard,
-            "reaction_description": reaction_description,
-            "predicted_yield": f"{predicted_yield}%",
-            "reactant1_smiles": r1_smiles,
-            "reactant2_smiles": r2_smiles,
-            "product_smiles": product_smiles or product_name,
-            "prediction_method": "ml_model"
-        }
+            description = result.pop("reaction_description", None)
+            yield ndjson("prediction", **result)
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error in ML prediction: {str(e)}")
+            outcome = {"complete": True}
+            if not description:
+                parts = []
+                outcome["complete"] = False
+                for text in stream_reaction_description(data.reactant1, data.reactant2, result["reaction_type"], result["safety_hazard_level"], deadline=deadline, outcome=outcome):
+                    parts.append(text)
+                    yield ndjson("description", text=text)
+                description = "".join(parts).strip()
+            else:
+                yield ndjson("description", text=description)
+
+            result["reaction_description"] = description
+            # don't cache a description that was cut short or replaced by the placeholder
+            if result["prediction_tier"] not in ("lookup", "cache") and outcome["complete"]:
+                prediction_cache.set(prediction_cache_key(data.reactant1, data.reactant2), result)
+            yield ndjson("done", **result)
+        except DeadlineExceeded as e:
+            yield ndjson("error", detail=f"Request timed out ({e})")
+        except HTTPException as e:
+            yield ndjson("error", detail=e.detail)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            yield ndjson("error", detail=f"Error in prediction: {str(e)}")
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
 @app.post("/chat")
-async def research_chat(data: ChatInput):
+def research_chat(data: ChatInput, request: Request):
+    # sync so the blocking gemini call runs in the threadpool, not on the event loop
     if chatbot is None:
         raise HTTPException(status_code=503, detail="Chatbot service not available")
+    check_token_limit(data.message)
+    query_log.record("/chat", message=data.message)
     
     try:
-        response = chatbot.chat(user_message=data.message, session_id=data.session_id)
+        response = chatbot.chat(user_message=data.message, session_id=data.session_id, deadline=request_deadline(request))
         return {
             "response": response["answer"],
             "sources": response.get("sources", []),
             "session_id": response.get("session_id", data.session_id),
             "timestamp": datetime.now().isoformat(),
-            "model": "gemini-2.5-flash"
+            "model": "gemini-2.5-flash",
+            "usage": response.get("usage")
         }
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @app.post("/predict_product_llm")
-def predict_product_llm(data: ReactionInput):
+def predict_product_llm(data: ReactionInput, request: Request = None):
     # predict product using gemini as fallback
+    check_token_limit(data.reactant1, data.reactant2)
     try:
-        gemini_result = predict_product_with_gemini(data.reactant1, data.reactant2)
-        # attempt smiles conversions when available
-        try:
-            r1_smiles = name_to_smiles(data.reactant1) or data.reactant1
-        except Exception:
-            r1_smiles = data.reactant1
-        try:
-            r2_smiles = name_to_smiles(data.reactant2) or data.reactant2
-        except Exception:
-            r2_smiles = data.reactant2
-
-        product_name = gemini_result.get("product", "Unknown product")
-        product_smiles = gemini_result.get("product_smiles") or product_name
-
-        return {
-            "reaction_type": gemini_result.get("reaction_type", "Unknown"),
-            "product": product_name,
-            "safety_hazard_level": gemini_result.get("safety_hazard_level", "Medium"),
-            "reaction_description": gemini_result.get("reaction_description", ""),
-            "predicted_yield": f"{gemini_result.get('predicted_yield', 80.0)}%",
-            "reactant1_smiles": r1_smiles,
-            "reactant2_smiles": r2_smiles,
-            "product_smiles": product_smiles,
-            "prediction_method": "gemini-2.5-flash"
-        }
-    except HTTPException:
+        deadline = request_deadline(request)
+        result = predict_with_gemini(data.reactant1, data.reactant2, deadline=deadline)
+        if not result["reaction_description"]:
+            result["reaction_description"] = generate_reaction_description(
+                data.reactant1, data.reactant2, result["reaction_type"], result["safety_hazard_level"], deadline=deadline)
+        return result
+    except (HTTPException, DeadlineExceeded):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in LLM prediction: {str(e)}")
@@ -298,3 +509,40 @@ async def clear_chat_session(session_id: str = "default"):
         return {"message": f"Session {session_id} cleared"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+def warmup_hooks():
+    def warm_batch(pairs):
+        # name resolution, product and embedding caches of this process
+        if ML_MODEL_AVAILABLE:
+            ml_predict_reactions_batch(pairs, input_type="name")
+
+    def warm_prediction(reactant1, reactant2):
+        run_prediction(reactant1, reactant2)
+
+    def warm_chat(message):
+        if chatbot is not None:
+            session_id = f"warmup-{os.getpid()}"
+            chatbot.chat(user_message=message, session_id=session_id)
+            chatbot.clear_session(session_id)
+
+    def busy():
+        return any(state.in_flight for state in admission.endpoints.values())
+
+    return {"warm_batch": warm_batch, "warm_prediction": warm_prediction, "warm_chat": warm_chat, "busy": busy}
+
+@app.on_event("startup")
+def warm_models():
+    # runs in each worker after fork, before it accepts requests
+    if not ML_MODEL_AVAILABLE or os.getenv("MODEL_WARMUP_ON_STARTUP", "1") != "1":
+        return
+    try:
+        inference_runtime.configure_torch()
+        inference_runtime.warmup()
+        print("models warmed up")
+    except Exception as e:
+        print(f"model warmup skipped: {e}")
+
+@app.on_event("startup")
+def warm_caches():
+    if os.getenv("WARMUP_ON_STARTUP", "1") == "1":
+        start_background_warmup(query_log, **warmup_hooks())
@@ -0,0 +1,169 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from ML_Model.utils.deadline_utils import DeadlineExceeded
+
+class CircuitBreaker:
+    '''
+    Opens after `threshold` consecutive failures (errors or SLO misses) and
+    lets a single trial call through once `cooldown` seconds have passed.
+    '''
+
+    def __init__(self, threshold=3, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        # only call right before the tier really runs: in half-open this takes the trial slot
+        with self.lock:
+            state = self.state
+            if state == "half-open":
+                # one trial at a time; push the window forward until it reports back
+                self.opened_at = time.monotonic()
+                return True
+            return state == "closed"
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+class Tier:
+    '''
+    One way of answering a prediction. fn(reactant1, reactant2, deadline) returns
+    a response dict, or None when this tier has no answer (e.g. a lookup miss).
+    '''
+
+    def __init__(self, name, fn, expected_latency, slo_seconds, available=lambda: True, inline=False):
+        self.name = name
+        self.fn = fn
+        self.avg_latency = expected_latency
+        self.slo_seconds = slo_seconds
+        self.available = available
+        self.inline = inline  # cheap enough to run on the caller's thread, never hedged
+        self.breaker = CircuitBreaker()
+        self.calls = 0
+        self.answered = 0
+        self.failures = 0
+
+    def record(self, elapsed, ok, cut_short=False):
+        self.calls += 1
+        if ok:
+            # only successful calls: a tier failing in a millisecond isn't a fast tier,
+            # and would otherwise be sorted ahead of the healthy ones. health is the breaker's job
+            self.avg_latency = 0.8 * self.avg_latency + 0.2 * elapsed
+        if cut_short and elapsed <= self.slo_seconds:
+            # the request's deadline (which clients can shorten) ran out before
+            # this tier's own SLO did; that says nothing about the tier's health
+            return
+        if ok and elapsed <= self.slo_seconds:
+            self.breaker.record_success()
+        else:
+            self.failures += 1
+            self.breaker.record_failure()
+
+    def stats(self):
+        return {
+            "avg_latency_s": round(self.avg_latency, 4),
+            "slo_s": self.slo_seconds,
+            "calls": self.calls,
+            "answered": self.answered,
+            "failures": self.failures,
+            "breaker": self.breaker.state,
+            "available": bool(self.available()),
+        }
+
+class PredictionPlanner:
+    '''
+    Tries tiers cheapest-first (by observed latency), skipping unhealthy ones.
+    When a tier runs past its SLO the next tier is started alongside it and
+    whichever answers first wins.
+    '''
+
+    def __init__(self, tiers, max_workers=8):
+        self.tiers = tiers
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="planner")
+
+    def plan(self):
+        # breaker state is only peeked here; the half-open trial is taken in predict
+        ready = [t for t in self.tiers if t.available() and t.breaker.state != "open"]
+        return sorted(ready, key=lambda t: t.avg_latency)
+
+    def _call(self, tier, reactant1, reactant2, deadline):
+        started = time.monotonic()
+        try:
+            result = tier.fn(reactant1, reactant2, deadline)
+        except DeadlineExceeded:
+            tier.record(time.monotonic() - started, ok=False, cut_short=True)
+            return None
+        except Exception as e:
+            print(f"[planner] {tier.name} failed: {e}")
+            tier.record(time.monotonic() - started, ok=False)
+            return None
+        tier.record(time.monotonic() - started, ok=True)
+        if result:
+            tier.answered += 1
+            result["prediction_tier"] = tier.name
+        return result
+
+    def _first_result(self, pending, timeout):
+        # wait for any pending tier to answer; None on timeout or when all of them came back empty
+        end = None if timeout is None else time.monotonic() + timeout
+        while pending:
+            remaining = None if end is None else max(0.0, end - time.monotonic())
+            done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                return None
+            for future in done:
+                pending.pop(future)
+                result = future.result()
+                if result:
+                    return result
+        return None
+
+    def predict(self, reactant1, reactant2, deadline=None):
+        pending = {}
+        for tier in self.plan():
+            if deadline is not None:
+                deadline.check(f"{tier.name} tier")
+            if not tier.breaker.allow():
+                continue
+            if tier.inline:
+                result = self._call(tier, reactant1, reactant2, deadline)
+                if result:
+                    return result
+                continue
+            pending[self.pool.submit(self._call, tier, reactant1, reactant2, deadline)] = tier
+            timeout = tier.slo_seconds if deadline is None else min(tier.slo_seconds, deadline.remaining())
+            result = self._first_result(pending, timeout)
+            if result:
+                return result
+
+        # every tier has been tried; give the slow ones the rest of the budget
+        result = self._first_result(pending, None if deadline is None else deadline.remaining())
+        if result:
+            return result
+        if deadline is not None:
+            deadline.check("prediction")
+        return None
+
+    def stats(self):
+        return {t.name: t.stats() for t in self.tiers}
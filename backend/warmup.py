@@ -0,0 +1,171 @@
+"""
+Query log + cache warm-up.
+
+Every /predict_all and /chat input is appended to a JSONL query log
+(QUERY_LOG_ENABLED=0 turns it off). After a deploy or restart the most frequent
+recent queries are replayed in a background thread so name resolution,
+embedding/model and response caches are warm before real traffic asks for them.
+
+The replayed work runs on the same inference / planner / resolve pools as real
+requests, at normal priority. What keeps it out of the way is that it pauses
+whenever a real request is in flight and makes one call at a time.
+
+Runs automatically on startup (WARMUP_ON_STARTUP=1), or as a one-off job
+that fills the shared on-disk caches before switching traffic over:
+
+    python warmup.py --top-n 200
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+
+QUERY_LOG_PATH = Path(os.getenv("QUERY_LOG_PATH", Path(__file__).resolve().parent / "cache" / "query_log.jsonl"))
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", 20 * 1024 * 1024))
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "1") == "1"
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", 100))
+WARMUP_RECENT_LINES = int(os.getenv("WARMUP_RECENT_LINES", 50000))
+
+class QueryLog:
+    '''
+    Append-only JSONL sink. Lines are small single writes, so several workers can append safely.
+    '''
+
+    def __init__(self, path=QUERY_LOG_PATH, max_bytes=QUERY_LOG_MAX_BYTES, enabled=QUERY_LOG_ENABLED):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, **fields):
+        if not self.enabled:
+            return
+        line = json.dumps({"ts": time.time(), "endpoint": endpoint, **fields}) + "\n"
+        try:
+            with self.lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if self.path.exists() and self.path.stat().st_size > self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            # logging must never break a request
+            print(f"query log write failed: {e}")
+
+    def _rotate(self):
+        # every worker may cross max_bytes at the same moment; the flock makes one of them
+        # rotate and the others see the fresh file, instead of overwriting .1 with it
+        with open(self.path.with_suffix(".rotate.lock"), "w") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            if self.path.exists() and self.path.stat().st_size > self.max_bytes:
+                os.replace(self.path, self.path.with_suffix(self.path.suffix + ".1"))
+
+    def recent(self, max_lines=WARMUP_RECENT_LINES):
+        if not self.path.exists():
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            lines = deque(f, maxlen=max_lines)
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+def top_reactions(entries, n):
+    # counts are order/case-insensitive; the first spelling seen is replayed
+    counts, first_seen = Counter(), {}
+    for e in entries:
+        if e.get("endpoint") != "/predict_all":
+            continue
+        r1, r2 = e.get("reactant1", ""), e.get("reactant2", "")
+        key = tuple(sorted((r1.strip().lower(), r2.strip().lower())))
+        counts[key] += 1
+        first_seen.setdefault(key, (r1, r2))
+    return [first_seen[k] for k, _ in counts.most_common(n)]
+
+def top_chat_messages(entries, n):
+    counts, first_seen = Counter(), {}
+    for e in entries:
+        if e.get("endpoint") != "/chat":
+            continue
+        message = e.get("message", "")
+        key = " ".join(message.lower().split())
+        counts[key] += 1
+        first_seen.setdefault(key, message)
+    return [first_seen[k] for k, _ in counts.most_common(n)]
+
+def _try_exclusive(path):
+    # only one process per host replays full requests (those fill the shared on-disk caches)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(path, "w")
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return handle
+    except OSError:
+        return None
+
+def run_warmup(query_log, warm_batch=None, warm_prediction=None, warm_chat=None,
+               top_n=WARMUP_TOP_N, batch_size=16, busy=lambda: False):
+    '''
+    warm_batch(pairs)        -> fills in-process caches through the batched model pipeline
+    warm_prediction(r1, r2)  -> full /predict_all path, fills the shared response cache
+    warm_chat(message)       -> first-turn chat answer, fills the shared chat cache
+    Pauses while busy() says real requests are in flight.
+    '''
+    entries = query_log.recent()
+    reactions = top_reactions(entries, top_n)
+    messages = top_chat_messages(entries, top_n)
+    if not reactions and not messages:
+        print("[warmup] query log empty, nothing to warm")
+        return
+    started = time.monotonic()
+    print(f"[warmup] replaying {len(reactions)} reactions and {len(messages)} chat messages")
+
+    def wait_until_idle():
+        while busy():
+            time.sleep(0.5)
+
+    def attempt(fn, *args):
+        wait_until_idle()
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"[warmup] {fn.__name__} failed: {e}")
+
+    if warm_batch is not None:
+        for i in range(0, len(reactions), batch_size):
+            attempt(warm_batch, reactions[i:i + batch_size])
+
+    lock = _try_exclusive(query_log.path.with_suffix(".warmup.lock"))
+    if lock is not None:
+        try:
+            if warm_prediction is not None:
+                for r1, r2 in reactions:
+                    attempt(warm_prediction, r1, r2)
+            if warm_chat is not None:
+                for message in messages:
+                    attempt(warm_chat, message)
+        finally:
+            lock.close()
+
+    print(f"[warmup] done in {time.monotonic() - started:.1f}s")
+
+def start_background_warmup(query_log, **kwargs):
+    thread = threading.Thread(target=run_warmup, args=(query_log,), kwargs=kwargs, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay frequent queries to fill the shared caches")
+    parser.add_argument("--top-n", type=int, default=WARMUP_TOP_N)
+    args = parser.parse_args()
+
+    import main
+    run_warmup(main.query_log, top_n=args.top_n, **main.warmup_hooks())
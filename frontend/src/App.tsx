@@ -13,6 +13,7 @@ interface ReactionResult {
   safety_hazard_level: string;
   reaction_description: string;
   predicted_yield: string;
+  yield_uncertainty?: number | null;
 }
 
 interface PredictionHistory {
@@ -106,38 +107,64 @@ function App() {
     setResult(null);
 
     try {
-      // prefer llm endpoint; fallback to ml if unavailable
-      const llmEndpoint = "http://127.0.0.1:8000/predict_product_llm";
-      const mlEndpoint = "http://127.0.0.1:8000/predict_all";
+      // stream results as they become available: reactants, then the prediction, then the description
+      const streamEndpoint = "http://127.0.0.1:8000/predict_all/stream";
 
-      let res = await fetch(llmEndpoint, {
+      const res = await fetch(streamEndpoint, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ reactant1: r1, reactant2: r2 }),
       });
+      if (!res.ok || !res.body) {
+        const errorText = await res.text();
+        throw new Error(`Server error: ${res.status} - ${errorText}`);
+      }
+
+      const latest: { result: ReactionResult | null } = { result: null };
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = "";
 
-      if (!res.ok) {
-        // fallback if llm route not available
-        res = await fetch(mlEndpoint, {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ reactant1: r1, reactant2: r2 }),
-        });
-        if (!res.ok) {
-          const errorText = await res.text();
-          throw new Error(`Server error: ${res.status} - ${errorText}`);
+      const handleEvent = (event: any) => {
+        if (event.event === "error") {
+          throw new Error(event.detail);
+        }
+        const current = latest.result;
+        if (event.event === "prediction") {
+          latest.result = { ...event, reaction_description: "" };
+        } else if (event.event === "description" && current) {
+          latest.result = { ...current, reaction_description: current.reaction_description + event.text };
+        } else if (event.event === "done") {
+          latest.result = event;
+        }
+        if (latest.result) {
+          setResult(latest.result);
+          setLoading(false);
+        }
+      };
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split("\n");
+        buffered = lines.pop() ?? "";
+        for (const line of lines) {
+          if (line.trim()) handleEvent(JSON.parse(line));
         }
       }
+      if (buffered.trim()) handleEvent(JSON.parse(buffered));
+      const finalResult = latest.result;
+      if (!finalResult) {
+        throw new Error("No prediction received");
+      }
 
-      const data: ReactionResult = await res.json();
-      setResult(data);
-      
       // Add to history
       const historyEntry: PredictionHistory = {
         id: Date.now().toString(),
         compound: `${r1} + ${r2}`,
-        reaction_type: data.reaction_type,
-        yield: data.predicted_yield,
+        reaction_type: finalResult.reaction_type,
+        yield: finalResult.predicted_yield,
         timestamp: new Date()
       };
       setPredictionHistory(prev => [historyEntry, ...prev.slice(0, 4)]);
@@ -414,6 +441,9 @@ Generated by ChemPredict AI
                 <p className="text-gray-500 text-xs mb-2">Predicted Yield</p>
                 <p className="text-white text-sm font-light">
                   {result.predicted_yield}
+                  {result.yield_uncertainty != null && (
+                    <span className="text-gray-500"> ± {result.yield_uncertainty}%</span>
+                  )}
                 </p>
               </div>
             </div>